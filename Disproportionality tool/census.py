@@ -0,0 +1,157 @@
+'''
+The school census headcounts every comparison is made against, for every LA
+and year at once.
+
+headcount_cube sums the 'Total' headcount of the SPC pupils by ethnicity
+census by LA, year and ethnicity in a single groupby, into an LAs x years x
+27 array of the denominators Denominator(LA, Date) gives one at a time,
+main-group totals included. batch_comparison then compares a numerator
+with every LA in every year in one call to compare, and returns a long
+table with a row for each LA, year and ethnicity:
+
+    results = batch_comparison(data, InputList)
+    results[results['ethnicity'] == 'Black - Black Caribbean']
+
+DenominatorCube keeps that array, saved as a .npy file and opened
+memory-mapped, so looking up one LA-year's denominators is an index into
+it rather than a scan of the census:
+
+    cube = DenominatorCube.from_census(data)
+    cube.save('census store/_denominators')
+    cube = DenominatorCube.load('census store/_denominators')
+    ComparisonDF = cube.comparison(LAname, Year, InputList)
+'''
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from disproportionality import CHART_TITLES, ETHNICITIES, SUBGROUPS, compare, comparison_table
+
+
+SUBGROUP_ETHNICITIES = [ethnicity for group in SUBGROUPS.values() for ethnicity in group]
+# Where each main group's sub-groups start among SUBGROUP_ETHNICITIES
+GROUP_STARTS = np.cumsum([0] + [len(group) for group in SUBGROUPS.values()][:-1])
+
+
+def with_main_groups(subgroups):
+    '''
+    subgroups, numbers for the 21 sub-groups along the last axis, followed by
+    the totals of their six main groups, in the order of ETHNICITIES.
+    '''
+    subgroups = np.asarray(subgroups)
+    return np.concatenate([subgroups, np.add.reduceat(subgroups, GROUP_STARTS, axis=-1)], axis=-1)
+
+def headcount_cube(data):
+    '''
+    The LAs and years of data, the SPC pupils by ethnicity census, both
+    sorted, and an LAs x years x 27 array of their 'Total' headcounts in the
+    order of ETHNICITIES. LA-years that aren't in the census are all 0.
+    '''
+    totals = data[data['phase_type_grouping'] == 'Total']
+    las = np.sort(totals['la_name'].dropna().unique())
+    years = np.sort(totals['time_period'].dropna().unique())
+    # With every key categorical, the groupby gives every LA, year and
+    # sub-group, in order, so its sums fold straight into the cube. Rows
+    # without an LA, such as the national and regional ones, are left out.
+    keys = [pd.Categorical(totals['la_name'], categories=las),
+            pd.Categorical(totals['time_period'], categories=years),
+            pd.Categorical(totals['ethnicity'], categories=SUBGROUP_ETHNICITIES)]
+    sums = totals['headcount'].groupby(keys, observed=False).sum()
+    cube = sums.to_numpy().reshape(len(las), len(years), len(SUBGROUP_ETHNICITIES))
+    return las, years, with_main_groups(cube)
+
+def batch_comparison(data, numerator):
+    '''
+    numerator, 27 numbers in the order of ETHNICITIES, compared with the
+    census of every LA in every year of data. numerator can also be an
+    LAs x years x 27 array, giving each LA-year its own numbers, or a frame
+    of the 27 ETHNICITIES indexed by LA and census year, such as
+    count_numerators gives, to compare only the LA-years it has.
+
+    Returns a long table of the comparison columns, one row per LA, year and
+    ethnicity, for the LA-years the census has pupils for.
+    '''
+    las, years, denominator = headcount_cube(data)
+    present = denominator.sum(axis=-1) > 0
+    if isinstance(numerator, pd.DataFrame):
+        index = pd.MultiIndex.from_product([las, years])
+        present &= index.isin(numerator.index).reshape(present.shape)
+        numerator = numerator[ETHNICITIES].reindex(index, fill_value=0).to_numpy()
+        numerator = numerator.reshape(denominator.shape)
+    numerator = np.broadcast_to(np.asarray(numerator), denominator.shape)
+    results = compare(numerator, denominator)
+
+    la, year = np.nonzero(present)
+    table = pd.DataFrame({
+        'la_name': np.repeat(las[la], len(ETHNICITIES)),
+        'time_period': np.repeat(years[year], len(ETHNICITIES)),
+        'ethnicity': np.tile(ETHNICITIES, len(la)),
+        'Chart Titles': np.tile(CHART_TITLES, len(la)),
+        'numerator': numerator[present].ravel(),
+        'denominator': denominator[present].ravel(),
+    })
+    for column, values in results.items():
+        table[column] = values[present].ravel()
+    return table
+
+
+class DenominatorCube():
+    '''
+    The headcounts of headcount_cube, looked up by LA and year. source is
+    whatever the cube was built from, such as the checksum of the census,
+    so a saved cube can be checked against it.
+    '''
+
+    def __init__(self, las, years, headcounts, source=None):
+        self.las = [str(la) for la in las]
+        self.years = [int(year) for year in years]
+        self.headcounts = headcounts
+        self.source = source
+        self._las = {la: i for i, la in enumerate(self.las)}
+        self._years = {year: i for i, year in enumerate(self.years)}
+
+    @classmethod
+    def from_census(cls, data, source=None):
+        return cls(*headcount_cube(data), source=source)
+
+    def lookup(self, la, year):
+        '''The 27 denominators of la in year, in the order of ETHNICITIES.'''
+        if la not in self._las:
+            raise KeyError(f'{la!r} is not an LA in the census')
+        if int(year) not in self._years:
+            raise KeyError(f'{year!r} is not a year of the census')
+        return np.asarray(self.headcounts[self._las[la], self._years[int(year)]])
+
+    def frame(self, la, year):
+        '''The denominators of la in year as Denominator(LA, Date) gives them.'''
+        return pd.DataFrame({'ethnicity': ETHNICITIES, 'denominator': self.lookup(la, year)})
+
+    def comparison(self, la, year, numerator):
+        '''comparison_table of numerator, in the order of ETHNICITIES, against la in year.'''
+        comparison = self.frame(la, year)
+        comparison['numerator'] = numerator
+        return comparison_table(comparison)
+
+    def save(self, folder):
+        '''Writes the headcounts to folder as a .npy file, with their index.'''
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        np.save(folder / 'headcounts.npy', np.asarray(self.headcounts))
+        index = {'las': self.las, 'years': self.years, 'ethnicities': ETHNICITIES, 'source': self.source}
+        (folder / 'index.json').write_text(json.dumps(index))
+
+    @classmethod
+    def load(cls, folder, mmap=True):
+        '''
+        The cube saved in folder, its headcounts memory-mapped read-only
+        unless mmap is false. Raises FileNotFoundError when there isn't one.
+        '''
+        folder = Path(folder)
+        index = json.loads((folder / 'index.json').read_text())
+        if index['ethnicities'] != ETHNICITIES:
+            raise ValueError(f'The cube in {folder} has different ethnicities to ETHNICITIES')
+        headcounts = np.load(folder / 'headcounts.npy', mmap_mode='r' if mmap else None)
+        return cls(index['las'], index['years'], headcounts, index['source'])
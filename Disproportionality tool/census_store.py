@@ -0,0 +1,204 @@
+'''
+A local copy of the school census the disproportionality tool compares with.
+
+The SPC pupils by ethnicity and language census is published inside the
+explore-education-statistics release zip. open_census downloads that zip
+once, or imports it (or the CSV inside it) from a local file when there's
+no network. It checks the file's SHA-256 and keeps only the five columns
+Denominator needs. These are written, typed, to a parquet dataset with
+one folder per year. Every later run reads the dataset from disk, and can
+ask for only the years it needs:
+
+    data = open_census('census store')
+    data = open_census('census store', source='spc_pupils_ethnicity_and_language_.csv')
+    data = open_census('census store', years=[202122, 202223])
+
+open_denominators keeps the census's headcounts in the store too, as a
+DenominatorCube, rebuilt only when the census changes, so the
+denominators of any LA and year can be looked up without loading the
+census at all:
+
+    denominators = open_denominators('census store')
+    ComparisonDF = denominators.frame(LAname, Year)
+
+Headcounts the census suppresses, such as 'x' or 'z', are stored as
+missing, which pandas' sum skips.
+'''
+
+import hashlib
+import json
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+from census import DenominatorCube
+
+
+CENSUS_URL = ('https://content.explore-education-statistics.service.gov.uk/api/releases/'
+              'cf516998-1dc1-411d-8225-13f6320547fb/files')
+CENSUS_FILE = 'data/spc_pupils_ethnicity_and_language_.csv'
+
+# The columns Denominator uses and the types they are stored as
+CENSUS_COLUMNS = {
+    'la_name': 'category',
+    'time_period': 'int32',
+    'ethnicity': 'category',
+    'phase_type_grouping': 'category',
+    'headcount': 'Int64',
+}
+
+# pyarrow skips files starting with _ when it reads the dataset
+MANIFEST = '_manifest.json'
+DENOMINATORS = '_denominators'
+STORE_VERSION = 1
+
+
+def file_sha256(path):
+    '''The SHA-256 of the file at path, as hex.'''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def verify_sha256(path, sha256=None):
+    '''
+    The SHA-256 of the file at path. Raises ValueError when sha256 is given
+    and the file's doesn't match it.
+    '''
+    checksum = file_sha256(path)
+    if sha256 is not None and checksum != sha256.lower():
+        raise ValueError(f'{path} has SHA-256 {checksum}, expected {sha256}')
+    return checksum
+
+def download(url, path):
+    '''Streams url to the file at path.'''
+    import requests
+
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for block in response.iter_content(1 << 20):
+                f.write(block)
+
+def read_census_csv(source, member=CENSUS_FILE):
+    '''
+    The CENSUS_COLUMNS of the census CSV at source, or of member of the
+    release zip at source, typed. Other columns aren't parsed.
+    '''
+    types = {column: kind for column, kind in CENSUS_COLUMNS.items() if column != 'headcount'}
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as z, z.open(member) as f:
+            data = pd.read_csv(f, usecols=list(CENSUS_COLUMNS), dtype=types | {'headcount': str})
+    else:
+        data = pd.read_csv(source, usecols=list(CENSUS_COLUMNS), dtype=types | {'headcount': str})
+    data['headcount'] = pd.to_numeric(data['headcount'], errors='coerce').astype(CENSUS_COLUMNS['headcount'])
+    return data[list(CENSUS_COLUMNS)]
+
+def import_census(source, store, sha256=None):
+    '''
+    Replaces the census in the store folder with the one in source, the
+    release zip or the CSV from it. When sha256 is given, source must have
+    that checksum, or ValueError is raised and the store is left as it was.
+    '''
+    return _import_census(source, store, verify_sha256(source, sha256))
+
+def _import_census(source, store, checksum):
+    # The new census is written next to the store and only swapped in once
+    # it is complete, so a failed import leaves the old one in place
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    data = read_census_csv(source)
+    store = Path(store)
+    store.parent.mkdir(parents=True, exist_ok=True)
+    building = Path(tempfile.mkdtemp(prefix=f'{store.name} importing ', dir=store.parent))
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        pq.write_to_dataset(table, building, partition_cols=['time_period'])
+        manifest = {'version': STORE_VERSION, 'source': Path(source).name, 'sha256': checksum,
+                    'rows': len(data), 'years': sorted(int(year) for year in data['time_period'].unique())}
+        (building / MANIFEST).write_text(json.dumps(manifest, indent=1))
+
+        if store.exists():
+            old = building.with_name(building.name.replace(' importing ', ' replaced ', 1))
+            store.rename(old)
+            try:
+                building.rename(store)
+            except BaseException:
+                old.rename(store)
+                raise
+            shutil.rmtree(old)
+        else:
+            building.rename(store)
+    finally:
+        if building.exists():
+            shutil.rmtree(building)
+    return manifest
+
+def read_manifest(store):
+    '''The manifest of the census in store, or None if it has none or an old one.'''
+    path = Path(store) / MANIFEST
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text())
+    return manifest if manifest.get('version') == STORE_VERSION else None
+
+def load_census(store, years=None):
+    '''The census in store, for years only when they're given.'''
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([('time_period', pa.int32())]), flavor='hive')
+    dataset = ds.dataset(store, format='parquet', partitioning=partitioning)
+    where = None if years is None else ds.field('time_period').isin([int(year) for year in years])
+    data = dataset.to_table(columns=list(CENSUS_COLUMNS), filter=where).to_pandas()
+    for column, kind in CENSUS_COLUMNS.items():
+        data[column] = data[column].astype(kind)
+    return data
+
+def open_census(store='census store', source=None, sha256=None, url=CENSUS_URL, years=None):
+    '''
+    The census from the store folder. It is built first from source, a local
+    copy of the release zip or of its CSV, when one is given. Otherwise it is
+    downloaded from url, but only when the store is empty. sha256, when
+    given, is checked against the file either way.
+    '''
+    store = Path(store)
+    # The download is saved next to the store, so its folder has to exist first
+    store.parent.mkdir(parents=True, exist_ok=True)
+    if source is not None:
+        checksum = verify_sha256(source, sha256)
+        manifest = read_manifest(store)
+        if manifest is None or manifest['sha256'] != checksum:
+            _import_census(source, store, checksum)
+    elif read_manifest(store) is None:
+        download_to = store.with_name(store.name + ' download.zip')
+        try:
+            download(url, download_to)
+            import_census(download_to, store, sha256)
+        finally:
+            download_to.unlink(missing_ok=True)
+    return load_census(store, years)
+
+def open_denominators(store='census store'):
+    '''
+    The DenominatorCube of the census in the store folder, memory-mapped.
+    It is built from the census, and saved in the store, the first time and
+    whenever the census has changed since.
+    '''
+    store = Path(store)
+    manifest = read_manifest(store)
+    if manifest is None:
+        raise FileNotFoundError(f'No census in {store}, open it with open_census first')
+    try:
+        cube = DenominatorCube.load(store / DENOMINATORS)
+        if cube.source == manifest['sha256']:
+            return cube
+    except (FileNotFoundError, ValueError):
+        pass
+    DenominatorCube.from_census(load_census(store), manifest['sha256']).save(store / DENOMINATORS)
+    return DenominatorCube.load(store / DENOMINATORS)
@@ -0,0 +1,220 @@
+'''
+The disproportionality calculations, for every ethnic group at once.
+
+Each comparison is a numerator and a denominator for the 27 ethnicities of
+ETHNICITIES: the 21 census sub-groups followed by the six main-group totals.
+compare works on whole arrays, so one comparison or thousands of them (one
+row each) are worked out with the same handful of NumPy operations, and the
+chi-squared test runs as array arithmetic rather than one
+stats.chi2_contingency call per row. The results match the notebooks' own
+loops, which round with NumPy too.
+
+    ComparisonDF = Denominator(LAname, Year)
+    ComparisonDF['numerator'] = InputList
+    ComparisonDF = comparison_table(ComparisonDF)
+
+    results = compare(numerators, denominators)   # arrays of comparisons x 27
+    results['RRI']
+
+For small groups, where the rate can swing a long way from year to year,
+rate_intervals gives Monte Carlo confidence intervals for the rate per
+10,000 and RRI of every group. Each replicate is a simulated numerator
+for every group, and all the replicates are drawn in one NumPy call:
+
+    ComparisonDF = with_intervals(ComparisonDF, seed=1)
+    ComparisonDF[['RRI', 'RRI lower', 'RRI upper']]
+'''
+
+import warnings
+
+import numpy as np
+from scipy import stats
+
+
+# The census sub-groups making up each main group, in the order they are
+# compared in
+SUBGROUPS = {
+    'White': ['White - White British', 'White - Any other White background', 'White - Gypsy/Roma',
+              'White - Irish', 'White - Traveller of Irish heritage'],
+    'Asian': ['Asian - Any other Asian background', 'Asian - Bangladeshi', 'Asian - Chinese',
+              'Asian - Indian', 'Asian - Pakistani'],
+    'Black': ['Black - Any other Black background', 'Black - Black African', 'Black - Black Caribbean'],
+    'Mixed': ['Mixed - Any other Mixed background', 'Mixed - White and Asian',
+              'Mixed - White and Black African', 'Mixed - White and Black Caribbean'],
+    'Other': ['Any other ethnic group', 'Not obtained', 'Refused'],
+    'Unclassified': ['Unclassified'],
+}
+MAIN_GROUPS = [f'{group} Total' for group in SUBGROUPS]
+ETHNICITIES = [ethnicity for group in SUBGROUPS.values() for ethnicity in group] + MAIN_GROUPS
+
+CHART_TITLES = ['WBRI', 'WOTH', 'WROM', 'WIRI', 'WIRT', 'AOTH', 'ABAN', 'ACHN', 'AIND', 'APKN',
+                'BOTH', 'BAFR', 'BCRB', 'MOTH', 'MWAS', 'MWBA', 'MWBC', 'OOTH', 'NOBT', 'REFU',
+                'Unkn', 'White', 'Asian', 'Black', 'Mixed', 'Other', 'Unkn']
+
+# Rates are compared with White British, and the expected counts share out
+# the children of a known main group, White to Other
+BASELINE = 0
+KNOWN_ETHNICITY = slice(21, 26)
+
+SIGNIFICANCE = 0.05
+
+INTERVAL_METHODS = ('poisson', 'binomial')
+
+
+def chi2_2x2(yes_observed, no_observed, yes_expected, no_expected):
+    '''
+    The p-values of stats.chi2_contingency, Yates' correction and all, for
+    the 2 x 2 tables [[yes_observed, no_observed], [yes_expected, no_expected]]
+    given as arrays, one table per element. Tables chi2_contingency would
+    refuse, with a negative count or an expected frequency of zero, get NaN.
+    '''
+    observed = np.stack([np.stack([yes_observed, no_observed], axis=-1),
+                         np.stack([yes_expected, no_expected], axis=-1)], axis=-2).astype(np.float64)
+    rows = observed.sum(axis=-1, keepdims=True)
+    columns = observed.sum(axis=-2, keepdims=True)
+    total = observed.sum(axis=(-2, -1), keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = rows * columns / total
+        refused = (observed < 0).any(axis=(-2, -1)) | (expected == 0).any(axis=(-2, -1))
+
+        diff = expected - observed
+        observed = observed + np.minimum(0.5, np.abs(diff)) * np.sign(diff)
+        terms = (observed - expected) ** 2 / expected
+    statistic = terms.reshape(terms.shape[:-2] + (4,)).sum(axis=-1)
+    return np.where(refused, np.nan, stats.chi2.sf(statistic, 1))
+
+def compare(numerator, denominator):
+    '''
+    Every column of the comparison table, as arrays shaped like numerator
+    and denominator, whose last axis runs over the 27 ETHNICITIES. Extra
+    leading axes are separate comparisons, worked out together.
+    '''
+    numerator = np.asarray(numerator)
+    denominator = np.asarray(denominator)
+    if numerator.shape[-1] != len(ETHNICITIES) or denominator.shape[-1] != len(ETHNICITIES):
+        raise ValueError(f'Expected {len(ETHNICITIES)} ethnicities, in the order of ETHNICITIES, '
+                         f'got numerator {numerator.shape} and denominator {denominator.shape}')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = numerator / denominator
+        percentages = np.where(denominator != 0, np.round(share * 100, 1), 0)
+        rate = np.where(denominator != 0, np.round(share * 10000, 1), 0)
+        rri = np.round(rate / rate[..., BASELINE:BASELINE + 1], 2)
+
+        known_numerator = numerator[..., KNOWN_ETHNICITY].sum(axis=-1, keepdims=True)
+        known_denominator = denominator[..., KNOWN_ETHNICITY].sum(axis=-1, keepdims=True)
+        yes_expected = np.round(denominator / known_denominator * known_numerator)
+    no_observed = known_numerator - numerator
+    no_expected = known_numerator - yes_expected
+
+    p = np.round(chi2_2x2(numerator, no_observed, yes_expected, no_expected), 4)
+    p = np.where(numerator == 0, 0, p)
+    significant = p < SIGNIFICANCE
+
+    higher = numerator > yes_expected
+    lower = numerator < yes_expected
+    higher_lower = np.where(higher, 'Higher', np.where(lower, 'Lower', 'Same or input error'))
+
+    results = {
+        'Percentages': percentages,
+        'Rate per 10,000': rate,
+        'RRI': rri,
+        'NoObserved': no_observed,
+        'Yes Observed': numerator,
+        'Yes Expected': yes_expected,
+        'No Expected': no_expected,
+        'Chi Squared': p,
+        'Higher Lower': higher_lower,
+        'Stat Sig': np.where(significant, 'Sig', 'Not Sig'),
+    }
+    # RRI is split on whether it is above or below 1, the rate and
+    # percentage on whether the numerator is above or below what's expected
+    splits = {
+        'RRI': ('RRI', rri > 1, rri < 1),
+        'RP10k': ('Rate per 10,000', higher, lower),
+        'PCT': ('Percentages', higher, lower),
+    }
+    for name, (column, above, below) in splits.items():
+        value = results[column]
+        sig_higher = np.where(above & significant, value, 0)
+        sig_lower = np.where(below & significant, value, 0)
+        either = sig_higher + sig_lower
+        results[f'Sig Higher {name}'] = sig_higher
+        results[f'Sig Lower {name}'] = sig_lower
+        results[f'NoSigDiff{name}Calc'] = either
+        results['No Sig Diff (RRI)' if name == 'RRI' else f'No Sig Diff {name}'] = np.where(either == 0, value, 0)
+    return results
+
+def comparison_table(comparison):
+    '''
+    comparison, a frame of the 27 ETHNICITIES in order with 'numerator' and
+    'denominator' columns, with the columns of the notebooks' comparison
+    table added: percentages, rates, RRI, the chi-squared test and the
+    significantly higher and lower splits.
+    '''
+    comparison = comparison.copy()
+    results = compare(comparison['numerator'].to_numpy(), comparison['denominator'].to_numpy())
+    # The notebooks keep the expected counts as whole numbers
+    for column in ('Yes Expected', 'No Expected'):
+        if np.isfinite(results[column]).all():
+            results[column] = results[column].astype(np.int64)
+    columns = list(results)
+    columns.insert(columns.index('Sig Higher RRI'), 'Chart Titles')
+    results['Chart Titles'] = CHART_TITLES
+    for column in columns:
+        comparison[column] = results[column]
+    return comparison
+
+def rate_intervals(numerator, denominator, level=0.95, replicates=10000, method='poisson', seed=None):
+    '''
+    Confidence intervals at level for the rate per 10,000 and RRI of each
+    group, from replicates simulated numerators per group: Poisson counts
+    with the numerator as their mean, or, with method='binomial', a
+    parametric bootstrap drawing each group's numerator from its
+    denominator at the observed rate. seed makes the draws repeatable.
+
+    Arrays are shaped like compare's, the last axis over ETHNICITIES, and
+    the intervals are rounded as the rates and RRI are. Groups with no
+    denominator get 0, as their rate does.
+    '''
+    if method not in INTERVAL_METHODS:
+        raise ValueError(f'method must be one of {INTERVAL_METHODS}, not {method!r}')
+    numerator = np.asarray(numerator)
+    denominator = np.asarray(denominator)
+    size = (replicates,) + np.broadcast_shapes(numerator.shape, denominator.shape)
+    rng = np.random.default_rng(seed)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'poisson':
+            draws = rng.poisson(numerator, size)
+        else:
+            share = np.clip(np.where(denominator > 0, numerator / denominator, 0), 0, 1)
+            draws = rng.binomial(denominator, share, size)
+        rate = np.where(denominator != 0, draws / denominator * 10000, 0)
+        rri = rate / rate[..., BASELINE:BASELINE + 1]
+
+    tail = (1 - level) / 2
+    with warnings.catch_warnings():
+        # Replicates where White British has a rate of 0 too give no RRI,
+        # and groups with no RRI in any replicate give no interval
+        warnings.simplefilter('ignore', RuntimeWarning)
+        rate_bounds = np.quantile(rate, [tail, 1 - tail], axis=0)
+        rri_bounds = np.nanquantile(rri, [tail, 1 - tail], axis=0)
+    return {
+        'Rate per 10,000 lower': np.round(rate_bounds[0], 1),
+        'Rate per 10,000 upper': np.round(rate_bounds[1], 1),
+        'RRI lower': np.round(rri_bounds[0], 2),
+        'RRI upper': np.round(rri_bounds[1], 2),
+    }
+
+def with_intervals(comparison, level=0.95, replicates=10000, method='poisson', seed=None):
+    '''
+    comparison, a comparison table, with the rate_intervals of its
+    numerators and denominators added as columns.
+    '''
+    comparison = comparison.copy()
+    intervals = rate_intervals(comparison['numerator'].to_numpy(), comparison['denominator'].to_numpy(),
+                               level, replicates, method, seed)
+    for column, values in intervals.items():
+        comparison[column] = values
+    return comparison
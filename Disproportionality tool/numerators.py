@@ -0,0 +1,86 @@
+'''
+Counts the numerators of a comparison from child level data, rather than
+typing them into ethnic_input.
+
+Child level returns, such as the SSDA903 header, record each child's
+ethnicity as a code like WBRI or MWBA. count_numerators maps the codes
+to the census ethnicities and counts the children of every group of the
+by columns, every LA and year for instance, in one categorical groupby.
+It gives a frame with a column for each of the 27 ETHNICITIES, main-group
+totals included, so each row can be used as InputList, and the frame as a
+whole can be passed to batch_comparison:
+
+    children = pd.read_csv('header.csv')
+    children['time_period'] = census_period(children['YEAR'])
+    Numerators = count_numerators(children, 'ETHNIC', by=['LA', 'time_period'])
+    InputList = Numerators.loc[('East Sussex', 201617)].tolist()
+    results = batch_comparison(data, Numerators)
+'''
+
+import pandas as pd
+
+from census import SUBGROUP_ETHNICITIES, with_main_groups
+from disproportionality import ETHNICITIES
+
+
+# The census ethnicity each ethnicity code of the children's returns counts
+# towards. Children with no code, or one not listed here, are Unclassified.
+ETHNIC_CODES = {
+    'WBRI': 'White - White British',
+    'WOTH': 'White - Any other White background',
+    'WROM': 'White - Gypsy/Roma',
+    'WIRI': 'White - Irish',
+    'WIRT': 'White - Traveller of Irish heritage',
+    'AOTH': 'Asian - Any other Asian background',
+    'ABAN': 'Asian - Bangladeshi',
+    'CHNE': 'Asian - Chinese',
+    'ACHN': 'Asian - Chinese',
+    'AIND': 'Asian - Indian',
+    'APKN': 'Asian - Pakistani',
+    'BOTH': 'Black - Any other Black background',
+    'BAFR': 'Black - Black African',
+    'BCRB': 'Black - Black Caribbean',
+    'MOTH': 'Mixed - Any other Mixed background',
+    'MWAS': 'Mixed - White and Asian',
+    'MWBA': 'Mixed - White and Black African',
+    'MWBC': 'Mixed - White and Black Caribbean',
+    'OOTH': 'Any other ethnic group',
+    'NOBT': 'Not obtained',
+    'REFU': 'Refused',
+}
+UNCLASSIFIED = 'Unclassified'
+
+
+def census_ethnicities(codes):
+    '''
+    codes, a Series of ethnicity codes in any case, as a categorical of
+    census ethnicities, with a category for each census sub-group.
+    '''
+    ethnicities = codes.astype('string').str.strip().str.upper().map(ETHNIC_CODES)
+    return pd.Categorical(ethnicities.fillna(UNCLASSIFIED), categories=SUBGROUP_ETHNICITIES)
+
+def census_period(years):
+    '''
+    The census time_period, such as 201617, of the academic year each
+    return year, such as 2017 for the year to 31 March 2017, falls in.
+    '''
+    return (years - 1) * 100 + years % 100
+
+def count_numerators(children, ethnicity='ETHNIC', by=('LA', 'YEAR')):
+    '''
+    How many children of each of the 27 ETHNICITIES there are in every
+    group of the by columns of children, as a frame indexed by them. With
+    no by columns, the counts of the whole file as a Series.
+
+    Each child is counted once per row, so a file with a row per child per
+    year should be grouped by year.
+    '''
+    by = list(by)
+    ethnicities = pd.Series(census_ethnicities(children[ethnicity]), index=children.index, name='ethnicity')
+    if not by:
+        counts = ethnicities.value_counts(sort=False).reindex(SUBGROUP_ETHNICITIES)
+        return pd.Series(with_main_groups(counts.to_numpy()), index=ETHNICITIES)
+
+    counts = children.groupby(by + [ethnicities], observed=True).size()
+    counts = counts.unstack(fill_value=0).reindex(columns=SUBGROUP_ETHNICITIES, fill_value=0)
+    return pd.DataFrame(with_main_groups(counts.to_numpy()), index=counts.index, columns=ETHNICITIES)
@@ -0,0 +1,209 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import census_store
+from census import (SUBGROUP_ETHNICITIES, DenominatorCube, batch_comparison, headcount_cube,
+                    with_main_groups)
+from census_store import file_sha256, open_census, open_denominators
+from disproportionality import (ETHNICITIES, chi2_2x2, compare, comparison_table, rate_intervals,
+                                with_intervals)
+from numerators import census_period, count_numerators
+# run these in the cmd line using python -m pytest <filepath>
+
+
+def test_chi2_2x2_matches_chi2_contingency():
+    tables = [[30, 70, 50, 50], [5, 995, 1, 999], [400, 600, 401, 599], [7, 0, 7, 0], [-1, 5, 2, 2]]
+    yes_observed, no_observed, yes_expected, no_expected = np.array(tables).T
+
+    p = chi2_2x2(yes_observed, no_observed, yes_expected, no_expected)
+    for table, got in zip(tables[:3], p):
+        assert got == stats.chi2_contingency(np.reshape(table, (2, 2))).pvalue
+    # Tables chi2_contingency refuses, with a zero expected frequency or a
+    # negative count
+    assert np.isnan(p[3:]).all()
+
+def test_comparison_table_columns():
+    denominator = with_main_groups([6000, 300, 30, 25, 8, 56, 87, 24, 35, 7, 12, 50, 9,
+                                    150, 73, 84, 75, 56, 0, 0, 112])
+    numerator = with_main_groups([600, 60, 0, 2, 1, 5, 9, 2, 3, 1, 1, 9, 1,
+                                  20, 7, 8, 7, 5, 0, 0, 11])
+    comparison = comparison_table(pd.DataFrame({'ethnicity': ETHNICITIES, 'denominator': denominator,
+                                                'numerator': numerator}))
+
+    white_british = comparison.iloc[0]
+    assert (white_british['Percentages'], white_british['RRI']) == (10.0, 1.0)
+    assert white_british['Higher Lower'] == 'Lower'
+    other_white = comparison.iloc[1]
+    assert (other_white['Rate per 10,000'], other_white['RRI']) == (2000.0, 2.0)
+    assert (other_white['Stat Sig'], other_white['Sig Higher RRI'], other_white['No Sig Diff (RRI)']) == ('Sig', 2.0, 0)
+    # Groups with no children in the census or in the input aren't tested
+    assert comparison.loc[comparison['ethnicity'] == 'Refused', ['Percentages', 'Chi Squared']].values.tolist() == [[0, 0]]
+    assert comparison['Chart Titles'].tolist()[:3] == ['WBRI', 'WOTH', 'WROM']
+
+    # A batch of comparisons gives what each gives on its own
+    batch = compare(np.stack([numerator, numerator * 2]), np.stack([denominator, denominator]))
+    assert (batch['RRI'][0] == comparison['RRI'].to_numpy()).all()
+    assert (batch['Chi Squared'][1] == compare(numerator * 2, denominator)['Chi Squared']).all()
+
+def test_rate_intervals_are_seeded_and_cover_the_rate():
+    denominator = with_main_groups(np.full(21, 1000))
+    numerator = with_main_groups(np.r_[100, np.arange(1, 21) * 5])
+    comparison = comparison_table(pd.DataFrame({'ethnicity': ETHNICITIES, 'denominator': denominator,
+                                                'numerator': numerator}))
+
+    for method in ['poisson', 'binomial']:
+        intervals = with_intervals(comparison, replicates=2000, method=method, seed=7)
+        assert intervals.equals(with_intervals(comparison, replicates=2000, method=method, seed=7))
+        assert (intervals['Rate per 10,000 lower'] <= intervals['Rate per 10,000']).all()
+        assert (intervals['Rate per 10,000'] <= intervals['Rate per 10,000 upper']).all()
+        assert (intervals['RRI lower'] <= intervals['RRI upper']).all()
+    # White British is its own baseline
+    assert (intervals.loc[0, 'RRI lower'], intervals.loc[0, 'RRI upper']) == (1.0, 1.0)
+
+    # Wider for small groups, and batched like compare
+    batch = rate_intervals(np.stack([numerator, numerator * 10]), np.stack([denominator, denominator * 10]),
+                           replicates=2000, seed=7)
+    width = batch['Rate per 10,000 upper'] - batch['Rate per 10,000 lower']
+    assert (width[0, 1:21] > width[1, 1:21]).all()
+
+def census_rows(la, year, headcounts, phase='Total'):
+    return pd.DataFrame({'la_name': la, 'time_period': year, 'ethnicity': SUBGROUP_ETHNICITIES,
+                         'phase_type_grouping': phase, 'headcount': headcounts})
+
+def test_batch_comparison_covers_every_la_year():
+    headcounts = np.arange(1, 22) * 100
+    data = pd.concat([census_rows('LA 2', 202122, headcounts),
+                      census_rows('LA 1', 202122, headcounts * 2),
+                      census_rows('LA 1', 202223, headcounts * 3),
+                      census_rows('LA 1', 202223, headcounts, phase='State-funded primary'),
+                      census_rows(None, 202223, headcounts * 100)])
+
+    las, years, cube = headcount_cube(data)
+    assert (las.tolist(), years.tolist()) == (['LA 1', 'LA 2'], [202122, 202223])
+    assert cube[0, 1].tolist() == with_main_groups(headcounts * 3).tolist()
+    # LA 2 has no census for 202223
+    assert cube[1, 1].sum() == 0
+
+    numerator = with_main_groups(np.arange(1, 22))
+    results = batch_comparison(data, numerator)
+    assert len(results) == 3 * len(ETHNICITIES)
+    assert results[['la_name', 'time_period']].drop_duplicates().values.tolist() == [
+        ['LA 1', 202122], ['LA 1', 202223], ['LA 2', 202122]]
+    la_1 = results[(results['la_name'] == 'LA 1') & (results['time_period'] == 202223)]
+    alone = comparison_table(pd.DataFrame({'ethnicity': ETHNICITIES, 'numerator': numerator,
+                                           'denominator': cube[0, 1]}))
+    assert la_1['Chi Squared'].tolist() == alone['Chi Squared'].tolist()
+    assert la_1['Rate per 10,000'].tolist() == alone['Rate per 10,000'].tolist()
+
+def test_census_store_imports_once_and_loads_by_year(tmp_path):
+    census = pd.concat([census_rows('LA 1', 202122, np.arange(21)),
+                        census_rows('LA 1', 202223, np.arange(21) + 1)])
+    census['percent_of_pupils'] = 0.5
+    census['headcount'] = census['headcount'].astype(object)
+    census.iloc[0, census.columns.get_loc('headcount')] = 'x'
+    source = tmp_path / 'spc_pupils_ethnicity_and_language_.csv'
+    census.to_csv(source, index=False)
+    store = tmp_path / 'census store'
+
+    with pytest.raises(ValueError, match='SHA-256'):
+        open_census(store, source=source, sha256='0' * 64)
+    assert not store.exists()
+
+    data = open_census(store, source=source, sha256=file_sha256(source))
+    assert list(data.columns) == ['la_name', 'time_period', 'ethnicity', 'phase_type_grouping', 'headcount']
+    assert str(data['headcount'].dtype) == 'Int64' and data['headcount'].isna().sum() == 1
+    assert sorted(path.name for path in store.glob('time_period=*')) == ['time_period=202122', 'time_period=202223']
+
+    # Once imported, the census is read from the store without the source
+    source.unlink()
+    later = open_census(store, years=[202223])
+    assert later['time_period'].unique().tolist() == [202223]
+    assert later['headcount'].tolist() == list(range(1, 22))
+
+def test_failed_import_keeps_the_last_census(tmp_path, monkeypatch):
+    source = tmp_path / 'census.csv'
+    census_rows('LA 1', 202122, np.arange(21)).to_csv(source, index=False)
+    store = tmp_path / 'census store'
+    hashed = []
+    sha256 = census_store.file_sha256
+    monkeypatch.setattr(census_store, 'file_sha256', lambda path: hashed.append(path) or sha256(path))
+    open_census(store, source=source)
+    open_denominators(store)
+    # The source is hashed once, not again by the import
+    assert hashed == [source]
+
+    def fail(*args, **kwargs):
+        raise OSError('No space left on device')
+    census_rows('LA 2', 202122, np.arange(21)).to_csv(source, index=False)
+    monkeypatch.setattr('pyarrow.parquet.write_to_dataset', fail)
+    with pytest.raises(OSError, match='No space'):
+        open_census(store, source=source)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['census store', 'census.csv']
+    assert open_census(store)['la_name'].unique().tolist() == ['LA 1']
+    assert (store / '_denominators' / 'headcounts.npy').exists()
+
+def test_download_into_a_new_nested_store(tmp_path, monkeypatch):
+    source = tmp_path / 'census.csv'
+    census_rows('LA 1', 202122, np.arange(21)).to_csv(source, index=False)
+    def download(url, path):
+        with zipfile.ZipFile(path, 'w') as release:
+            release.write(source, census_store.CENSUS_FILE)
+    monkeypatch.setattr(census_store, 'download', download)
+    store = tmp_path / 'stores' / 'census' / 'census store'
+
+    assert open_census(store)['la_name'].unique().tolist() == ['LA 1']
+    # Only the store is left, not the download
+    assert [path.name for path in store.parent.iterdir()] == ['census store']
+
+def test_denominator_cube_looks_up_saved_headcounts(tmp_path):
+    census = pd.concat([census_rows('LA 1', 202122, np.arange(21)),
+                        census_rows('LA 2', 202122, np.arange(1, 22) * 2)])
+    source = tmp_path / 'census.csv'
+    census.to_csv(source, index=False)
+    store = tmp_path / 'census store'
+    open_census(store, source=source)
+
+    denominators = open_denominators(store)
+    assert isinstance(denominators.headcounts, np.memmap)
+    assert denominators.lookup('LA 2', 202122).tolist() == with_main_groups(np.arange(1, 22) * 2).tolist()
+    frame = denominators.frame('LA 1', 202122)
+    assert frame['ethnicity'].tolist() == ETHNICITIES
+    with pytest.raises(KeyError, match='LA 3'):
+        denominators.lookup('LA 3', 202122)
+
+    numerator = with_main_groups(np.ones(21, dtype=int))
+    assert denominators.comparison('LA 2', 202122, numerator)['RRI'].tolist() == \
+        compare(numerator, denominators.lookup('LA 2', 202122))['RRI'].tolist()
+
+    # A new census replaces the saved cube
+    census_rows('LA 3', 202223, np.arange(21)).to_csv(source, index=False)
+    open_census(store, source=source)
+    assert open_denominators(store).las == ['LA 3']
+    assert DenominatorCube.load(store / '_denominators').years == [202223]
+
+def test_count_numerators_from_child_codes():
+    children = pd.DataFrame({'ETHNIC': ['WBRI', 'wbri ', 'CHNE', 'REFU', None, 'MWBA', 'XXXX'],
+                             'LA': ['LA 1', 'LA 1', 'LA 1', 'LA 1', 'LA 2', 'LA 2', 'LA 2'],
+                             'YEAR': 2017})
+    children['time_period'] = census_period(children['YEAR'])
+    numerators = count_numerators(children, 'ETHNIC', by=['LA', 'time_period'])
+
+    la_1 = numerators.loc[('LA 1', 201617)]
+    assert (la_1['White - White British'], la_1['Asian - Chinese'], la_1['Refused']) == (2, 1, 1)
+    assert la_1['Other Total'] == 1 and la_1.iloc[21:].sum() == 4
+    # Missing and unknown codes are Unclassified
+    la_2 = numerators.loc[('LA 2', 201617)]
+    assert (la_2['Unclassified'], la_2['Mixed Total']) == (2, 1)
+    assert count_numerators(children, 'ETHNIC', by=[]).tolist() == numerators.sum().tolist()
+
+    data = pd.concat([census_rows('LA 1', 201617, np.arange(1, 22) * 100),
+                      census_rows('LA 3', 201617, np.arange(1, 22) * 100)])
+    results = batch_comparison(data, numerators)
+    # Only LA-years with both a census and numerators are compared
+    assert results['la_name'].unique().tolist() == ['LA 1']
+    assert results['numerator'].tolist() == la_1.tolist()
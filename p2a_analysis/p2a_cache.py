@@ -0,0 +1,131 @@
+'''
+On-disk memo of the lemma and VADER sentiment scores of each question text.
+
+Each round of the mega matrix mostly repeats the questions of the last, so
+the lemma and scores of every text are kept in a SQLite file keyed on a
+hash of the text, and only texts that haven't been seen before are
+lemmatised and scored. The scores come back as one column per score rather
+than a dict per row, so there's no row-wise expansion afterwards.
+
+Entries are evicted least recently used first once the cache holds more
+than max_bytes of text and scores.
+'''
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+SCORE_COLUMNS = ['neg', 'neu', 'pos', 'compound']
+MAX_BYTES = 64 * 1024 ** 2
+# SQLite allows at most 999 parameters per statement in older builds
+QUERY_CHUNK = 500
+
+
+def normalise(text):
+    '''Texts that only differ in their whitespace share an entry.'''
+    return ' '.join(str(text).split())
+
+
+class TextCache():
+    '''
+    namespace is part of every key, so entries made with a different
+    lemmatiser or scorer can be kept apart by giving it a new name.
+    '''
+
+    def __init__(self, path, max_bytes=MAX_BYTES, namespace='wordnet+vader'):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS texts ('
+            'key BLOB PRIMARY KEY, lemma TEXT, neg REAL, neu REAL, pos REAL, compound REAL, '
+            'size INTEGER, used REAL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS texts_used ON texts (used)')
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text):
+        return hashlib.blake2b(
+            f'{self.namespace}\0{text}'.encode('utf-8'), digest_size=16
+        ).digest()
+
+    def _lookup(self, keys):
+        found = {}
+        for start in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[start:start + QUERY_CHUNK]
+            rows = self.connection.execute(
+                f"SELECT key, lemma, {', '.join(SCORE_COLUMNS)} FROM texts "
+                f"WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, lemma, *scores in rows:
+                found[key] = (lemma, scores)
+        return found
+
+    def lemmas_and_scores(self, texts, lemmatize, score):
+        '''
+        Returns the lemma of each of texts, via lemmatize(text), and a
+        DataFrame of the score(lemma) dicts, one column per score and one
+        row per text in order.
+        '''
+        texts = [normalise(text) for text in texts]
+        codes, unique_texts = pd.factorize(pd.Series(texts, dtype=object))
+        keys = [self.key(text) for text in unique_texts]
+
+        found = self._lookup(keys)
+        lemmas = np.empty(len(keys), dtype=object)
+        scores = np.zeros((len(keys), len(SCORE_COLUMNS)))
+        new_entries = []
+        now = time.time()
+        for i, (key, text) in enumerate(zip(keys, unique_texts)):
+            if key in found:
+                lemmas[i], scores[i] = found[key]
+                continue
+            lemma = lemmatize(text)
+            polarity = score(lemma)
+            lemmas[i] = lemma
+            scores[i] = [polarity[column] for column in SCORE_COLUMNS]
+            # The key and lemma plus six numbers' worth of scores and bookkeeping
+            size = len(key) + len(lemma.encode('utf-8')) + 48
+            new_entries.append((key, lemma, *scores[i].tolist(), size, now))
+
+        self.hits += len(keys) - len(new_entries)
+        self.misses += len(new_entries)
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?, ?, ?, ?)', new_entries
+            )
+            self.connection.executemany(
+                'UPDATE texts SET used = ? WHERE key = ?', [(now, key) for key in found]
+            )
+        self.evict()
+
+        return lemmas[codes].tolist(), pd.DataFrame(scores[codes], columns=SCORE_COLUMNS)
+
+    def size(self):
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM texts').fetchone()[0]
+
+    def evict(self):
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        # Drop the least recently used entries until enough size is freed
+        evicted = []
+        freed = 0
+        for key, size in self.connection.execute('SELECT key, size FROM texts ORDER BY used'):
+            evicted.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        with self.connection:
+            self.connection.executemany('DELETE FROM texts WHERE key = ?', evicted)
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,97 @@
+'''
+Which LAs collect each data item of the mega matrix, as one bitmask.
+
+Bit i of an item's mask is set when the i-th LA has text for it, so with
+four LAs an item collected by LA 1 and LA 3 has the mask 0b0101. Questions
+such as "collected by exactly k LAs", "only collected by LA X" or "collected
+by every LA but X" are then comparisons against one integer column, or its
+popcount, for any number of LAs, rather than a boolean mask per LA per
+question.
+
+    coverage = CoverageIndex(df, {'LA 1': 'sutton text', 'LA 2': 'essex text'})
+    df[coverage.only('LA 1')]
+    coverage.only_counts()
+'''
+
+import numpy as np
+import pandas as pd
+
+
+# The number of set bits in each byte
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def popcount(masks):
+    '''The number of set bits in each of an array of uint64 masks.'''
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    return POPCOUNT[masks.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+class CoverageIndex():
+    '''
+    columns maps each LA, in bit order, to the column of df that holds its
+    text; an LA collects an item when that column isn't empty. Every query
+    gives a boolean Series aligned with df, so df[query] keeps the rows in
+    their order in df.
+    '''
+
+    def __init__(self, df, columns):
+        if len(columns) > 64:
+            raise ValueError(f'At most 64 LAs fit in a mask, not {len(columns)}')
+
+        self.las = list(columns)
+        self.bits = {la: np.uint64(1) << np.uint64(i) for i, la in enumerate(self.las)}
+        self.everyone = np.uint64(2 ** len(self.las) - 1)
+
+        masks = np.zeros(len(df), dtype=np.uint64)
+        for la, column in columns.items():
+            masks[df[column].notna().to_numpy()] |= self.bits[la]
+        self.masks = pd.Series(masks, index=df.index, name='las')
+        self.la_counts = pd.Series(popcount(masks), index=df.index, name='la count')
+
+    def mask_of(self, las):
+        mask = np.uint64(0)
+        for la in las:
+            mask |= self.bits[la]
+        return mask
+
+    def las_in(self, mask):
+        return [la for la in self.las if int(mask) & int(self.bits[la])]
+
+    def collected_by(self, k):
+        '''Items collected by exactly k of the LAs.'''
+        return self.la_counts == k
+
+    def collected_by_all(self):
+        return self.masks == self.everyone
+
+    def only(self, la):
+        '''Items collected by la and none of the others.'''
+        return self.masks == self.bits[la]
+
+    def all_except(self, la):
+        '''Items collected by every LA but la.'''
+        return self.masks == self.everyone ^ self.bits[la]
+
+    def combination_counts(self):
+        '''
+        How many items each combination of LAs collects, most common first,
+        with the LAs of each combination.
+        '''
+        counts = self.masks.value_counts()
+        return pd.DataFrame({
+            'las': [self.las_in(mask) for mask in counts.index],
+            'la count': popcount(counts.index.to_numpy()),
+            'items': counts.to_numpy(),
+        }, index=counts.index.rename('mask'))
+
+    def only_counts(self):
+        '''How many items only each LA collects, in LA order.'''
+        counts = self.masks.value_counts()
+        return pd.Series([counts.get(self.bits[la], 0) for la in self.las], index=self.las)
+
+    def all_except_counts(self):
+        '''How many items every LA but each one collects, in LA order.'''
+        counts = self.masks.value_counts()
+        return pd.Series([counts.get(self.everyone ^ self.bits[la], 0) for la in self.las],
+                         index=self.las)
@@ -0,0 +1,180 @@
+'''
+Reads a sheet of the P2A mega matrix, once, into a columnar cache.
+
+The workbook is streamed with openpyxl in read-only mode, a row at a time,
+and the rows are typed the way pd.read_excel types them. The sheet is then
+written to a parquet file, so later runs on the same workbook read only the
+columns they need from that and skip parsing the Excel file altogether. The
+cache is rebuilt whenever the workbook changes.
+
+    df = read_matrix('Mega matrix.xlsx', 'All data items', cache_dir='.p2a cache')
+    la_text_columns(df.columns)   # {'Croydon': 'Croydon text', ...}
+
+Columns that mix text and numbers are cached as text, since parquet needs
+one type per column.
+'''
+
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+
+# '<LA> text', whatever its case, holds the question each LA asks
+LA_TEXT_PATTERN = r'(?i)^(?P<la>.+?)\s+text$'
+# Text columns of the statutory returns rather than of an LA
+NOT_LAS = {'annex a', '903'}
+
+CACHE_VERSION = 1
+
+
+def la_text_columns(columns, pattern=LA_TEXT_PATTERN, exclude=NOT_LAS):
+    '''
+    Maps each LA, by the name the pattern's 'la' group gives it, to its text
+    column, in the order the columns come in. LAs named in exclude, in any
+    case, are left out.
+    '''
+    pattern = re.compile(pattern)
+    found = {}
+    for column in columns:
+        match = pattern.match(str(column))
+        if match and match.group('la').strip().lower() not in exclude:
+            found[match.group('la').strip()] = column
+    return found
+
+def header_names(header):
+    '''
+    The column names pd.read_excel gives a header row: blank cells become
+    'Unnamed: <position>' and repeated names get '.1', '.2' and so on.
+    '''
+    names = []
+    seen = {}
+    for position, name in enumerate(header):
+        name = f'Unnamed: {position}' if name is None or name == '' else str(name)
+        base = name
+        while name in seen:
+            seen[base] += 1
+            name = f'{base}.{seen[base]}'
+        seen[name] = 0
+        names.append(name)
+    return names
+
+def _wanted(names, columns):
+    if columns is None:
+        return list(range(len(names)))
+    if callable(columns):
+        return [i for i, name in enumerate(names) if columns(name)]
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise KeyError(f'Columns not in the sheet: {missing}')
+    wanted = set(columns)
+    return [i for i, name in enumerate(names) if name in wanted]
+
+def stream_sheet(path, sheet, columns=None):
+    '''
+    Reads sheet of the workbook at path in openpyxl's read-only mode,
+    keeping only columns: a list of names, a function of the name, or None
+    for every column. The result matches pd.read_excel(path, sheet), less
+    the columns not asked for.
+    '''
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        # Like pd.read_excel, empty cells at the end of the header and of
+        # the sheet don't make columns or rows
+        while header and header[-1] in (None, ''):
+            header.pop()
+        # Columns asked for by name can only be in the header, so the rest
+        # of each row is dropped as it's read
+        keep = None if columns is None else _wanted(header_names(header), columns)
+
+        data = []
+        last = 0
+        width = len(header)
+        for row in rows:
+            filled = _last_filled(row)
+            if filled:
+                last = len(data) + 1
+                width = max(width, filled)
+            data.append(list(row) if keep is None else
+                         [row[i] if i < len(row) else None for i in keep])
+    finally:
+        workbook.close()
+    del data[last:]
+
+    if keep is None:
+        keep = list(range(width))
+        header += [None] * (width - len(header))
+        data = [row[:width] + [None] * (width - len(row)) for row in data]
+    names = header_names(header)
+    return TextParser(data, names=[names[i] for i in keep], header=None).read()
+
+def _last_filled(row):
+    for i in range(len(row), 0, -1):
+        if row[i - 1] not in (None, ''):
+            return i
+    return 0
+
+
+def _source_stamp(path, sheet):
+    stat = Path(path).stat()
+    return {'version': CACHE_VERSION, 'sheet': sheet,
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _cache_path(path, sheet, cache_dir):
+    path = Path(path)
+    cache_dir = path.parent if cache_dir is None else Path(cache_dir)
+    return cache_dir / f'{path.stem} - {sheet}.parquet'
+
+def _parquet_safe(df):
+    # Parquet needs one type per column, so mixed columns are kept as text
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        values = df[column].dropna()
+        if not values.map(type).eq(str).all():
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+def read_matrix(path, sheet='All data items', columns=None, cache_dir=None):
+    '''
+    The sheet of the workbook at path, with only columns (names, a function
+    of the name, or None for all), from the parquet cache in cache_dir
+    (next to the workbook by default) when it is up to date, and streamed
+    from the workbook, then cached, when it isn't. cache_dir=False turns
+    the cache off.
+    '''
+    if cache_dir is False:
+        return stream_sheet(path, sheet, columns)
+
+    import pyarrow.parquet as pq
+
+    cache = _cache_path(path, sheet, cache_dir)
+    stamp = _source_stamp(path, sheet)
+    if cache.exists():
+        metadata = pq.read_schema(cache).metadata or {}
+        cached = json.loads(metadata.get(b'p2a_source', b'{}'))
+        names = cached.pop('columns', [])
+        if cached == stamp:
+            return pd.read_parquet(cache, columns=[names[i] for i in _wanted(names, columns)])
+
+    # The whole sheet is cached, so asking for other columns later doesn't
+    # mean reading the workbook again. What's returned is what the cache
+    # will give back next time, so every run sees the same types.
+    df = _parquet_safe(stream_sheet(path, sheet))
+    _write_cache(df, cache, dict(stamp, columns=list(df.columns)))
+    return df[[df.columns[i] for i in _wanted(list(df.columns), columns)]]
+
+def _write_cache(df, cache, source):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'p2a_source'] = json.dumps(source).encode('utf-8')
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table.replace_schema_metadata(metadata), cache)
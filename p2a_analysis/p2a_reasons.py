@@ -0,0 +1,86 @@
+'''
+Agreement between LAs on the main reason they record each data item for.
+
+The reason columns of the mega matrix hold text such as '1. For social work
+practitioners and/or the child/YP'. Each LA's column is read once into the
+leading reason code, giving a small items x LAs integer matrix (0 where the
+LA gives no reason). Questions such as "which items do at least k LAs
+record for reason r" or "which LAs agree" are then array comparisons on that
+matrix, for any number of LAs and reasons.
+
+    reasons = ReasonMatrix(df, {'Croydon': 'Croydon Main reason for recording data item',
+                                'Essex': 'Essex Main reason for recording local data item'})
+    df[reasons.agreeing(1, k=2)]
+    reasons.agreement_counts(k=2)
+'''
+
+import numpy as np
+import pandas as pd
+
+
+NO_REASON = 0
+
+
+def reason_codes(column):
+    '''
+    The number each reason in column starts with, NO_REASON where there is
+    none. Only the leading number is read, so the '903' in reason 4 isn't
+    taken for a 3.
+    '''
+    codes = column.astype('string').str.extract(r'^\s*(\d+)', expand=False)
+    return pd.to_numeric(codes).fillna(NO_REASON).astype(np.int16).to_numpy()
+
+
+class ReasonMatrix():
+    '''
+    columns maps each LA to the column of df holding its main reason. Every
+    query that picks items gives a boolean Series aligned with df.
+    '''
+
+    def __init__(self, df, columns):
+        self.las = list(columns)
+        self.index = df.index
+        self.codes = np.column_stack([reason_codes(df[column]) for column in columns.values()])
+        self.reasons = np.unique(self.codes[self.codes != NO_REASON])
+        # How many LAs give each reason for each item, items x reasons
+        self.counts = (self.codes[:, :, None] == self.reasons[None, None, :]).sum(axis=1)
+
+    def _column(self, reason):
+        found = np.flatnonzero(self.reasons == reason)
+        if len(found) == 0:
+            return np.zeros(len(self.index), dtype=self.counts.dtype)
+        return self.counts[:, found[0]]
+
+    def agreeing(self, reason, k, exactly=False):
+        '''
+        Items that at least k LAs, or exactly k with exactly, record for
+        reason.
+        '''
+        counts = self._column(reason)
+        return pd.Series(counts == k if exactly else counts >= k, index=self.index)
+
+    def agreement_counts(self, k, exactly=False):
+        '''How many items at least (or exactly) k LAs record for each reason.'''
+        agree = self.counts == k if exactly else self.counts >= k
+        return pd.Series(agree.sum(axis=0), index=self.reasons, name='items')
+
+    def agreeing_las(self, reason):
+        '''The LAs that record each item for reason, as a list per item.'''
+        la_names = np.array(self.las, dtype=object)
+        return pd.Series([list(la_names[row]) for row in self.codes == reason],
+                         index=self.index, name=f'LAs giving reason {reason}')
+
+    def agreements(self, k, exactly=False):
+        '''
+        One row per item and reason that at least (or exactly) k LAs agree
+        on, in item order: the reason, how many LAs give it and which.
+        '''
+        agree = self.counts == k if exactly else self.counts >= k
+        items, reasons = np.nonzero(agree)
+        la_names = np.array(self.las, dtype=object)
+        return pd.DataFrame({
+            'reason': self.reasons[reasons],
+            'la count': self.counts[items, reasons],
+            'las': [list(la_names[self.codes[item] == self.reasons[reason]])
+                    for item, reason in zip(items, reasons)],
+        }, index=self.index[items])
@@ -0,0 +1,133 @@
+'''
+Renders the per-LA figures of the P2A text analysis.
+
+Every figure is built as its own matplotlib Figure rather than on pyplot's
+current figure, so nothing carries over from one figure to the next and no
+plt.clf() is needed. The matplotlib figure sets (word cloud, sentiment bar
+and sentiment box) are drawn in a pool of processes on the Agg backend,
+while the plotly frequency charts are exported from this process, so that
+one kaleido session is started once and reused for every chart.
+
+The files, names and sizes are the ones the analysis script has always
+written:
+
+    <LA> word cloud.png      10x7 inches, no title
+    <LA> fdist.png           plotly bar of the top 10 words
+    <LA> sentiment bar.png   10x7 inches
+    <LA> sentiment box.png   10x7 inches
+'''
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+FIGSIZE = (10, 7)
+
+
+def use_agg():
+    # Runs first in each worker, before seaborn imports pyplot
+    import matplotlib
+    matplotlib.use('Agg')
+
+def wordcloud_figure(words):
+    from matplotlib.figure import Figure
+    from wordcloud import WordCloud
+
+    cloud = WordCloud(width=600,
+                      height=400,
+                      random_state=2,
+                      max_font_size=100,
+                      background_color='white',
+                      colormap='tab20c',
+                      repeat=True,
+                      ).generate(words)
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    ax.imshow(cloud, interpolation='bilinear')
+    ax.axis('off')
+    return fig
+
+def sentiment_bar_figure(la, sentiment):
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    sns.countplot(y='sentiment', data=sentiment, ax=ax)
+    ax.set_title(f'{la}: number of questions with positive, negative, and neutral sentiment')
+    ax.set_xlabel('Sentiment')
+    ax.set_ylabel('Number of questions')
+    return fig
+
+def sentiment_box_figure(title, sentiment, hue=None):
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    sns.boxplot(y='compound', x='sentiment', data=sentiment, hue=hue, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel('Sentiment')
+    ax.set_ylabel('Distribution of scores')
+    ax.set_ylim(-1, 1)
+    return fig
+
+def fdist_figure(la, top_10):
+    import pandas as pd
+    import plotly.express as px
+
+    fdist = pd.Series(dict(top_10))
+    fig = px.bar(y=fdist.index,
+                 x=fdist.values,
+                 title=f'{la} top 10 word distribution',
+                 labels=dict(x="Word", y="Frequency"))
+
+    # sort values
+    fig.update_layout(barmode='stack', yaxis={'categoryorder':'total ascending'})
+    return fig
+
+def render_la(la, words, sentiment, output_dir):
+    '''
+    Draws and saves one LA's matplotlib figures. sentiment needs the
+    'compound' and 'sentiment' columns of the LA's questions.
+    '''
+    wordcloud_figure(words).savefig(f'{output_dir}/{la} word cloud.png')
+    sentiment_bar_figure(la, sentiment).savefig(f'{output_dir}/{la} sentiment bar')
+    sentiment_box_figure(f'{la}: distribution of sentiment scores',
+                         sentiment).savefig(f'{output_dir}/{la} sentiment box')
+
+def write_plotly_images(figures):
+    '''
+    Exports {path: figure} in this process, so kaleido's start up is only
+    paid on the first figure.
+    '''
+    for path, fig in figures.items():
+        fig.write_image(path)
+
+def render_las(figure_sets, output_dir, workers=None):
+    '''
+    figure_sets maps each LA to (words, top_10, sentiment): the lemmatised
+    text for its word cloud, its top 10 (word, count) pairs, and its
+    questions' sentiment. The LAs are drawn across workers processes.
+    '''
+    workers = workers or min(len(figure_sets), os.cpu_count())
+    # Forked workers start with everything the caller has already imported,
+    # pandas and numpy among them, where spawned ones would start a fresh
+    # interpreter and import it all again before drawing anything
+    context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=use_agg) as executor:
+        futures = [
+            executor.submit(render_la, la, words, sentiment[['compound', 'sentiment']], output_dir)
+            for la, (words, top_10, sentiment) in figure_sets.items()
+        ]
+        # The plotly charts are exported while the workers draw
+        write_plotly_images({
+            f'{output_dir}/{la} fdist.png': fdist_figure(la, top_10)
+            for la, (words, top_10, sentiment) in figure_sets.items()
+        })
+        for future in futures:
+            future.result()
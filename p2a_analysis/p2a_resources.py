@@ -0,0 +1,153 @@
+'''
+Start-up resources for the P2A text analysis: NLTK data and plotting libraries.
+
+ensure_nltk_data looks for each NLTK package on disk, in nltk.data.path,
+and only goes to the network for packages that aren't there, so on a
+machine with the data installed nothing is downloaded. Without network
+access the data the analysis script needs can be installed from a copy with
+
+    python -m nltk.downloader -d <dir> stopwords wordnet omw-1.4 vader_lexicon
+
+and <dir> put on the NLTK_DATA environment variable. text_analysis.ipynb
+still tokenises with word_tokenize, so it needs punkt as well.
+
+lazy_import returns a module that is only imported when one of its
+attributes is first used, so the plotting libraries cost nothing until a
+figure is drawn:
+
+    plt = lazy_import('matplotlib.pyplot')
+
+Run this file to time how long the analysis takes to start, with the
+plotting libraries imported up front and lazily:
+
+    python p2a_resources.py --repeats 5
+'''
+
+import argparse
+import importlib.util
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# Each package and the path nltk.data.find looks it up under
+NLTK_PACKAGES = {
+    'stopwords': 'corpora/stopwords',
+    'punkt': 'tokenizers/punkt',
+    'wordnet': 'corpora/wordnet',
+    'omw-1.4': 'corpora/omw-1.4',
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+}
+
+# What the analysis imports before it reads any data, with the plotting
+# libraries imported up front and lazily
+STARTUP_IMPORTS = {
+    'eager': (
+        'import pandas, numpy, nltk\n'
+        'import matplotlib.pyplot, seaborn, plotly.express, wordcloud\n'
+    ),
+    'lazy': (
+        'import pandas, numpy, nltk\n'
+        'from p2a_resources import lazy_import, missing_nltk_data\n'
+        "plt = lazy_import('matplotlib.pyplot')\n"
+        'missing_nltk_data()\n'
+    ),
+}
+
+_checked = set()
+
+
+def missing_nltk_data(packages=NLTK_PACKAGES):
+    '''The packages that aren't on disk anywhere in nltk.data.path.'''
+    import nltk
+
+    missing = []
+    for package in packages:
+        try:
+            nltk.data.find(NLTK_PACKAGES.get(package, package))
+        except LookupError:
+            missing.append(package)
+    return missing
+
+def ensure_nltk_data(packages=NLTK_PACKAGES, download=True):
+    '''
+    Makes sure the NLTK packages are available, downloading only the ones
+    that aren't on disk when download is true. Packages found once aren't
+    looked for again in the same process.
+
+    Raises LookupError naming the packages that are still missing.
+    '''
+    packages = [package for package in packages if package not in _checked]
+    missing = missing_nltk_data(packages)
+    if missing and download:
+        import nltk
+
+        for package in missing:
+            nltk.download(package, quiet=True)
+        missing = missing_nltk_data(missing)
+    if missing:
+        raise LookupError(
+            f"NLTK data not found: {', '.join(missing)}. Install it with "
+            f"'python -m nltk.downloader {' '.join(missing)}', or copy it from "
+            'a machine that has it and set NLTK_DATA to its folder'
+        )
+    _checked.update(packages)
+
+def lazy_import(name):
+    '''
+    The module name, imported the first time one of its attributes is used.
+    Modules already imported are returned as they are.
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def time_startup(code, repeats=5):
+    '''
+    Runs code in a new interpreter repeats times. Returns the seconds the
+    first run took, cold, when the modules may still have to be read from
+    disk and compiled, and the median of the warm runs after it.
+    '''
+    timed = (
+        'import time\n'
+        'start = time.perf_counter()\n'
+        f'{code}'
+        'print(time.perf_counter() - start)\n'
+    )
+    seconds = []
+    for _ in range(repeats):
+        run = subprocess.run([sys.executable, '-c', timed], capture_output=True, text=True,
+                             check=True, cwd=Path(__file__).parent)
+        seconds.append(float(run.stdout.split()[-1]))
+    return seconds[0], statistics.median(seconds[1:] or seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the start up of the P2A text analysis.')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='interpreters started for each way of importing')
+    args = parser.parse_args(argv)
+
+    print(f"{'imports':<8} {'cold s':>8} {'warm s':>8}")
+    for name, code in STARTUP_IMPORTS.items():
+        cold, warm = time_startup(code, args.repeats)
+        print(f'{name:<8} {cold:>8.3f} {warm:>8.3f}')
+
+    missing = missing_nltk_data()
+    print(f"NLTK data missing: {', '.join(missing) if missing else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+'''
+Token index and keyword matching for the P2A text analysis.
+
+Every LA's questions are tokenised once, with stopwords looked up in a set,
+and the word counts are kept per LA. The counts for a group of LAs, such as
+'All LAs', are the per-LA counts added together rather than a recount of
+the combined text, so the index grows with the number of questions, not
+with the number of LA combinations asked about.
+
+A KeywordMatcher compiles a list of terms into one regex and finds them all
+in a single pass over the questions, giving a sparse question x term matrix.
+Counts of questions per term, or of questions using any of a list of terms,
+are then sums over its columns rather than a scan of the text per term.
+'''
+
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# The same tokens as nltk's RegexpTokenizer('\w+')
+TOKEN_PATTERN = re.compile(r'\w+')
+WORD_CHAR = re.compile(r'\w')
+
+# Words of \w characters that nltk's word_tokenize still splits in two. The
+# frequency distribution used to be counted from word_tokenize, so these
+# keep the counts the same.
+WORD_TOKENIZE_SPLITS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na'),
+}
+
+
+class TokenIndex():
+    '''
+    texts maps each LA to a Series (or list) of its lowercased questions.
+
+    tokens[la] holds each question's tokens with the stopwords removed, and
+    counts[la] how often each word of at least min_length letters appears
+    across the LA's questions.
+    '''
+
+    def __init__(self, texts, stopwords, min_length=3):
+        self.stopwords = frozenset(stopwords)
+        self.min_length = min_length
+        self.tokens = {}
+        self.counts = {}
+        for la, questions in texts.items():
+            self.add(la, questions)
+
+    def add(self, la, questions):
+        stopwords = self.stopwords
+        tokens = [
+            [token for token in TOKEN_PATTERN.findall(question) if token not in stopwords]
+            for question in questions
+        ]
+
+        words = []
+        for question in tokens:
+            for token in question:
+                if len(token) >= self.min_length:
+                    words.extend(WORD_TOKENIZE_SPLITS.get(token, (token,)))
+
+        self.tokens[la] = tokens
+        self.counts[la] = Counter(words)
+
+    @property
+    def las(self):
+        return list(self.tokens)
+
+    def counts_for(self, las):
+        '''
+        Word counts over the questions of all of las. Ties in most_common()
+        come out in order of first appearance, as if the LAs' questions had
+        been counted one after the other in the order given.
+        '''
+        if len(las) == 1:
+            return self.counts[las[0]]
+
+        counts = Counter()
+        for la in las:
+            counts.update(self.counts[la])
+        return counts
+
+    def frequent_strings(self, las, min_count=3):
+        '''
+        Each question of las, in order, as a string of its tokens that appear
+        at least min_count times across las.
+        '''
+        counts = self.counts_for(las)
+        return [
+            ' '.join(token for token in question if counts[token] >= min_count)
+            for la in las
+            for question in self.tokens[la]
+        ]
+
+
+class KeywordMatcher():
+    '''
+    Finds terms, matched literally, in texts. With whole_words a term only
+    counts when it isn't part of a longer word, so 'view' no longer matches
+    'review'; without, a term matches anywhere, as str.contains does.
+    '''
+
+    def __init__(self, terms, whole_words=False, ignore_case=False):
+        self.terms = list(dict.fromkeys(terms))
+        self.whole_words = whole_words
+        self.columns = {term: i for i, term in enumerate(self.terms)}
+        # Longest first, so at each position the longest term starting there
+        # is the one matched, and the shorter ones are found from it
+        alternatives = '|'.join(re.escape(term) for term in sorted(self.terms, key=len, reverse=True))
+        if whole_words:
+            alternatives = rf'\b(?:{alternatives})\b'
+        # A lookahead matches at every position, so overlapping terms are all found
+        self.pattern = re.compile(rf'(?=({alternatives}))', re.IGNORECASE if ignore_case else 0)
+        self.ignore_case = ignore_case
+        self._found_in = {}
+
+    def _terms_in(self, matched):
+        # The columns of the terms that match at the start of matched
+        if matched in self._found_in:
+            return self._found_in[matched]
+
+        key = matched.lower() if self.ignore_case else matched
+        columns = []
+        for term, column in self.columns.items():
+            prefix = term.lower() if self.ignore_case else term
+            if not key.startswith(prefix):
+                continue
+            # A shorter term is only a whole word if the longer one has a
+            # word boundary straight after it
+            if (self.whole_words and len(prefix) < len(key)
+                    and bool(WORD_CHAR.match(key[len(prefix) - 1])) == bool(WORD_CHAR.match(key[len(prefix)]))):
+                continue
+            columns.append(column)
+        self._found_in[matched] = columns
+        return columns
+
+    def matrix(self, texts):
+        '''
+        A TermMatrix with a 1 where a text contains a term, one row per text
+        in order and one column per term.
+        '''
+        rows = []
+        columns = []
+        for row, text in enumerate(texts):
+            found = set()
+            for match in self.pattern.finditer(text):
+                found.update(self._terms_in(match.group(1)))
+            rows.extend([row] * len(found))
+            columns.extend(found)
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(len(texts), len(self.terms)),
+        )
+        return TermMatrix(matrix, self.terms)
+
+
+class TermMatrix():
+    '''
+    matrix is a sparse texts x terms matrix of 0s and 1s, with a column for
+    each of terms.
+    '''
+
+    def __init__(self, matrix, terms):
+        self.matrix = matrix
+        self.terms = terms
+        self.columns = {term: i for i, term in enumerate(terms)}
+
+    def counts(self, terms=None):
+        '''How many texts contain each of terms, all of them by default.'''
+        terms = self.terms if terms is None else terms
+        counts = np.asarray(self.matrix.sum(axis=0)).ravel()
+        return pd.Series(counts[[self.columns[term] for term in terms]], index=terms)
+
+    def counts_by(self, groups, terms=None):
+        '''
+        How many texts of each group contain each of terms. groups gives
+        every text's group; the result has a row per term and a column per
+        group, in order of first appearance.
+        '''
+        terms = self.terms if terms is None else terms
+        codes, names = pd.factorize(pd.Series(groups))
+        membership = sparse.csr_matrix(
+            (np.ones(len(codes), dtype=np.int32), (codes, np.arange(len(codes)))),
+            shape=(len(names), len(codes)),
+        )
+        counts = (membership @ self.matrix).toarray().T
+        return pd.DataFrame(counts[[self.columns[term] for term in terms]],
+                            index=terms, columns=list(names))
+
+    def contains_any(self, terms):
+        '''A boolean array, true for the texts containing any of terms.'''
+        columns = [self.columns[term] for term in terms]
+        return np.asarray(self.matrix[:, columns].sum(axis=1)).ravel() > 0
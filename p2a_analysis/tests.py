@@ -0,0 +1,161 @@
+import nltk
+import pandas as pd
+import pytest
+
+from p2a_cache import TextCache
+from p2a_coverage import CoverageIndex
+from p2a_matrix import la_text_columns, read_matrix
+from p2a_reasons import ReasonMatrix
+from p2a_render import render_la
+from p2a_resources import ensure_nltk_data, missing_nltk_data
+from p2a_text import KeywordMatcher, TokenIndex
+# run these in the cmd line using python -m pytest <filepath>
+
+
+STOPWORDS = ['the', 'of', 'is', 'child']
+
+def test_token_index_merges_la_counts():
+    index = TokenIndex({'LA 1': ['name of the child', 'child name', 'date of birth'],
+                        'LA 2': ['birth name', 'school name', 'cannot attend school']},
+                       STOPWORDS)
+
+    assert index.tokens['LA 1'] == [['name'], ['name'], ['date', 'birth']]
+    # 'cannot' is counted as word_tokenize splits it
+    assert index.counts['LA 2'] == {'birth': 1, 'name': 2, 'school': 2, 'can': 1, 'not': 1, 'attend': 1}
+
+    all_las = index.counts_for(['LA 1', 'LA 2'])
+    assert all_las.most_common(3) == [('name', 4), ('birth', 2), ('school', 2)]
+    assert index.frequent_strings(['LA 1', 'LA 2'], min_count=2) == [
+        'name', 'name', 'birth', 'birth name', 'school name', 'school',
+    ]
+    assert index.frequent_strings(['LA 1'], min_count=2) == ['name', 'name', '']
+
+def test_keyword_matcher_counts_in_one_pass():
+    texts = ['date of review', 'views and feelings', 'well-being review', 'name']
+    las = ['LA 1', 'LA 1', 'LA 2', 'LA 2']
+    terms = ['view', 'feel', 'well-being', 'well', 'review', 'view']
+
+    matrix = KeywordMatcher(terms).matrix(texts)
+    assert matrix.terms == ['view', 'feel', 'well-being', 'well', 'review']
+    # Overlapping terms are all found, as str.contains would
+    assert matrix.counts().tolist() == [3, 1, 1, 1, 2]
+    assert matrix.counts_by(las).to_dict() == {
+        'LA 1': {'view': 2, 'feel': 1, 'well-being': 0, 'well': 0, 'review': 1},
+        'LA 2': {'view': 1, 'feel': 0, 'well-being': 1, 'well': 1, 'review': 1},
+    }
+    feels = matrix.contains_any(['view', 'feel']) & ~matrix.contains_any(['review'])
+    assert feels.tolist() == [False, True, False, False]
+
+    words = KeywordMatcher(terms, whole_words=True).matrix(texts)
+    assert words.counts(['view', 'feel', 'well', 'review']).tolist() == [0, 0, 1, 2]
+
+def test_coverage_index_queries_la_masks():
+    df = pd.DataFrame({'a': ['x', 'x', None, 'x', None],
+                       'b': ['x', None, None, 'x', 'x'],
+                       'c': ['x', None, 'x', None, None]})
+    coverage = CoverageIndex(df, {'LA 1': 'a', 'LA 2': 'b', 'LA 3': 'c'})
+
+    assert coverage.masks.tolist() == [0b111, 0b001, 0b100, 0b011, 0b010]
+    assert coverage.collected_by(1).tolist() == [False, True, True, False, True]
+    assert df[coverage.only('LA 3')].index.tolist() == [2]
+    assert df[coverage.all_except('LA 3')].index.tolist() == [3]
+    assert coverage.only_counts().to_dict() == {'LA 1': 1, 'LA 2': 1, 'LA 3': 1}
+    assert coverage.all_except_counts().to_dict() == {'LA 1': 0, 'LA 2': 0, 'LA 3': 1}
+    assert coverage.combination_counts().loc[0b011, 'las'] == ['LA 1', 'LA 2']
+
+def test_reason_matrix_finds_agreeing_las():
+    statutory = '4. For statutory data requirements outside of the Annex A or 903 returns'
+    df = pd.DataFrame({'a': ['1. For practitioners', '1. For practitioners', statutory],
+                       'b': ['1. For practitioners', '2. For management', statutory],
+                       'c': ['1. For practitioners', '1. For practitioners', None]})
+    reasons = ReasonMatrix(df, {'LA 1': 'a', 'LA 2': 'b', 'LA 3': 'c'})
+
+    assert reasons.codes.tolist() == [[1, 1, 1], [1, 2, 1], [4, 4, 0]]
+    assert reasons.agreeing(1, k=3).tolist() == [True, False, False]
+    assert reasons.agreeing(1, k=2, exactly=True).tolist() == [False, True, False]
+    # '903' in reason 4 isn't read as reason 3
+    assert reasons.agreement_counts(k=2).to_dict() == {1: 2, 2: 0, 4: 1}
+    assert reasons.agreeing(3, k=1).sum() == 0
+    assert reasons.agreeing_las(4).tolist() == [[], [], ['LA 1', 'LA 2']]
+    agreements = reasons.agreements(k=2)
+    assert agreements['reason'].tolist() == [1, 1, 4]
+    assert agreements['las'].tolist() == [['LA 1', 'LA 2', 'LA 3'], ['LA 1', 'LA 3'], ['LA 1', 'LA 2']]
+
+def test_nltk_data_found_on_disk_without_download(tmp_path, monkeypatch):
+    (tmp_path / 'corpora' / 'stopwords').mkdir(parents=True)
+    monkeypatch.setattr(nltk.data, 'path', [str(tmp_path)])
+
+    assert missing_nltk_data(['stopwords', 'wordnet']) == ['wordnet']
+    ensure_nltk_data(['stopwords'], download=False)
+    with pytest.raises(LookupError, match='wordnet'):
+        ensure_nltk_data(['stopwords', 'wordnet'], download=False)
+
+def test_read_matrix_matches_read_excel_and_caches(tmp_path):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'All data items'
+    sheet.append(['Item number', 'Annex A text', 'Croydon text', 'Essex Text', 'Tags', 'Tags', None])
+    sheet.append([1, None, 'Name', None, 'Duplication', None])
+    sheet.append(['2a', 'Date of birth', None, 'Date of birth', None, 'Not relevant'])
+    sheet.append([None, None, None, None, None, None])
+    path = tmp_path / 'matrix.xlsx'
+    workbook.save(path)
+
+    expected = pd.read_excel(path, 'All data items')
+    assert read_matrix(path, cache_dir=False).equals(expected)
+    assert la_text_columns(expected.columns) == {'Croydon': 'Croydon text', 'Essex': 'Essex Text'}
+
+    cache_dir = tmp_path / 'cache'
+    first = read_matrix(path, cache_dir=cache_dir)
+    assert (cache_dir / 'matrix - All data items.parquet').exists()
+    assert read_matrix(path, cache_dir=cache_dir).equals(first)
+    texts = read_matrix(path, columns=['Croydon text', 'Tags.1'], cache_dir=cache_dir)
+    assert texts.equals(expected[['Croydon text', 'Tags.1']])
+    # Mixed columns come back as text
+    assert first['Item number'].tolist() == ['1', '2a']
+
+def length_score(text):
+    return {'neg': 0.0, 'neu': 1.0, 'pos': 0.0, 'compound': len(text) / 100}
+
+def test_text_cache_only_scores_unseen_texts(tmp_path):
+    scored = []
+    def score(text):
+        scored.append(text)
+        return length_score(text)
+
+    cache = TextCache(tmp_path / 'cache.sqlite')
+    lemmas, scores = cache.lemmas_and_scores(['name', 'dates', 'name'], str.upper, score)
+    assert lemmas == ['NAME', 'DATES', 'NAME']
+    assert scores['compound'].tolist() == [0.04, 0.05, 0.04]
+    assert scored == ['NAME', 'DATES']
+    cache.close()
+
+    cache = TextCache(tmp_path / 'cache.sqlite')
+    lemmas, scores = cache.lemmas_and_scores(['dates', ' name ', 'school'], str.upper, score)
+    assert lemmas == ['DATES', 'NAME', 'SCHOOL']
+    assert list(scores.columns) == ['neg', 'neu', 'pos', 'compound']
+    assert scored == ['NAME', 'DATES', 'SCHOOL']
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_text_cache_evicts_least_recently_used(tmp_path):
+    cache = TextCache(tmp_path / 'cache.sqlite', max_bytes=200)
+    for text in ['first', 'second', 'third', 'fourth']:
+        cache.lemmas_and_scores([text], str.upper, length_score)
+
+    assert cache.size() <= 200
+    cache.lemmas_and_scores(['first', 'fourth'], str.upper, length_score)
+    # 'first' was evicted and had to be scored again, 'fourth' was still there
+    assert (cache.hits, cache.misses) == (1, 5)
+
+def test_render_la_writes_figure_set(tmp_path):
+    from PIL import Image
+
+    sentiment = pd.DataFrame({'compound': [0.5, 0.0, -0.25, 0.75],
+                              'sentiment': ['positive', 'neutral', 'negative', 'positive']})
+    render_la('LA 1', 'name date birth school name', sentiment, tmp_path)
+
+    for figure in ['word cloud', 'sentiment bar', 'sentiment box']:
+        with Image.open(tmp_path / f'LA 1 {figure}.png') as image:
+            assert image.size == (1000, 700)
@@ -0,0 +1,151 @@
+'''
+Converts a directory of SEN2 XML returns without the Streamlit app.
+
+Each return is converted with sen2_xml, run through convert_for_sen2_tool and
+written out as the m1-m5 modules by sen2_export, one folder or file per return:
+
+    python sen2_batch.py <returns folder> <output folder> --format parquet
+
+Returns are converted concurrently, one per worker process. A return that
+fails to convert is reported and skipped, the rest of the batch carries on.
+
+With --profile a <return>_profile.json of the time, rows and memory of each
+stage and record type is written next to the output.
+
+With --index-dir only the persons that changed since the last run of a return
+with the same file name are converted (see sen2_incremental), and a <return>_changes.csv
+listing the added, changed and removed persons is written next to the output.
+'''
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from sen2_export import EXPORTERS, export
+from sen2_incremental import convert_incremental
+from sen2_profile import Profiler, profiled
+from sen2_xml import convert_stream, convert_for_sen2_tool
+
+
+def convert_return(path, output_dir, file_format, engine='sequential', workers=None,
+                   index_dir=None, profile=False):
+    '''Converts and exports one return, returning its timings and sizes.'''
+    profiler = Profiler() if profile else None
+    start = time.perf_counter()
+
+    changes = None
+    if index_dir is not None:
+        with profiled(profiler, 'parse') as stage:
+            data_files, changes = convert_incremental(path, index_dir / f'{path.stem}.sqlite')
+            stage['rows'] = sum(len(buffer) for buffer in data_files.buffers.values())
+    else:
+        data_files = convert_stream(path, engine=engine, workers=workers, profiler=profiler)
+    with profiled(profiler, 'convert_for_sen2_tool') as stage:
+        files = convert_for_sen2_tool(data_files.persons,
+                                      data_files.requests,
+                                      data_files.assessments,
+                                      data_files.named_plan,
+                                      data_files.active_plans)
+        rows = stage['rows'] = sum(len(df) for df in files)
+    convert_seconds = time.perf_counter() - start
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Built from the whole stem, as with_suffix would cut a dotted name such
+    # as SEN2.2024.v1 short and let versions of a return overwrite each other
+    output = output_dir / (f'{path.stem}.{file_format}' if file_format in ('xlsx', 'zip') else path.stem)
+    with profiled(profiler, f'export_{file_format}') as stage:
+        exported = export(files, output, file_format)
+        stage['rows'] = rows
+
+    result = {
+        'persons': len(data_files.persons),
+        'rows': rows,
+        'convert_seconds': convert_seconds,
+        'export_seconds': exported['seconds'],
+        'export_peak_bytes': exported['peak_bytes'],
+    }
+    if changes is not None:
+        changes.to_csv(output_dir / f'{path.stem}_changes.csv', index=False)
+        result['changes'] = changes['change'].value_counts().to_dict()
+    if profiler is not None:
+        (output_dir / f'{path.stem}_profile.json').write_text(profiler.to_json(indent=2))
+    return result
+
+def report(path, result):
+    print(f"{path.name}: {result['persons']} persons, {result['rows']} rows, "
+          f"converted in {result['convert_seconds']:.2f}s "
+          f"({result['persons'] / result['convert_seconds']:,.0f} persons/s), "
+          f"exported in {result['export_seconds']:.2f}s "
+          f"using {result['export_peak_bytes'] / 1024 ** 2:,.1f} MB")
+    if 'changes' in result:
+        changes = result['changes']
+        print(f"{path.name}: {changes.get('added', 0)} added, {changes.get('changed', 0)} changed, "
+              f"{changes.get('removed', 0)} removed since the last run")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a directory of SEN2 XML returns.')
+    parser.add_argument('input_dir', type=Path, help='folder of LA SEN2 XML returns')
+    parser.add_argument('output_dir', type=Path, help='folder to write the m1-m5 modules to')
+    parser.add_argument('--format', choices=list(EXPORTERS), default='csv', dest='file_format',
+                        help='csv and parquet write a folder of m1-m5 files per return, '
+                             'xlsx a workbook and zip a zip of CSVs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--engine', choices=['sequential', 'parallel'], default='sequential',
+                        help='sequential converts several returns at once, one per worker; '
+                             'parallel converts one return at a time split across the workers')
+    parser.add_argument('--index-dir', type=Path, default=None,
+                        help='keep a per-person index here and only convert the persons that '
+                             'changed since the last run (sequential engine only)')
+    parser.add_argument('--profile', action='store_true',
+                        help='write the time, rows and memory of each stage and record type '
+                             'to <return>_profile.json')
+    args = parser.parse_args(argv)
+    if args.index_dir and args.engine == 'parallel':
+        parser.error('--index-dir only works with the sequential engine')
+
+    # glob is case-sensitive on Linux, so .XML returns are matched by hand
+    paths = sorted(path for path in args.input_dir.iterdir()
+                   if path.is_file() and path.suffix.lower() == '.xml')
+    if not paths:
+        print(f'No .xml files found in {args.input_dir}', file=sys.stderr)
+        return 1
+
+    failed = []
+    start = time.perf_counter()
+
+    if args.engine == 'parallel':
+        for path in paths:
+            try:
+                report(path, convert_return(
+                    path, args.output_dir, args.file_format, 'parallel', args.workers,
+                    profile=args.profile
+                ))
+            except Exception as error:
+                print(f'{path.name}: skipped, {error!r}', file=sys.stderr)
+                failed.append(path)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(convert_return, path, args.output_dir, args.file_format,
+                                index_dir=args.index_dir, profile=args.profile): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    report(path, future.result())
+                except Exception as error:
+                    print(f'{path.name}: skipped, {error!r}', file=sys.stderr)
+                    failed.append(path)
+
+    print(f'Converted {len(paths) - len(failed)} of {len(paths)} returns '
+          f'in {time.perf_counter() - start:.2f}s')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+'''
+Throughput and memory benchmark for the SEN2 converter.
+
+A synthetic return is written with sen2_synthetic for each size, then run
+through each stage of the conversion in a fresh process:
+
+    parse       convert_stream, XML to the five typed modules
+    sen2_tool   convert_for_sen2_tool
+    export_*    sen2_export, once per --formats entry
+
+For every stage the time, rows per second and peak resident memory (both
+the process's peak and how far it rose during the stage) are recorded:
+
+    python sen2_benchmark.py --sizes 1000 10000 --save-baseline baseline.json
+    python sen2_benchmark.py --sizes 1000 10000 --baseline baseline.json
+
+With --baseline the run fails if any stage is more than --tolerance slower,
+or needs that much more memory, than it did in the baseline.
+'''
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sen2_export import EXPORTERS, PeakMemory, export
+from sen2_synthetic import write_return
+from sen2_xml import convert_stream, convert_for_sen2_tool
+
+
+SIZES = [1_000, 10_000, 100_000, 500_000]
+FORMATS = ['csv', 'parquet']
+TOLERANCE = 0.25
+# Differences this small are noise at the small sizes, so they aren't
+# counted as regressions however large they are relative to the baseline
+TIME_SLACK = 0.05
+MEMORY_SLACK = 32 * 1024 ** 2
+
+
+def _stage(name, persons, rows, seconds, memory):
+    return {
+        'persons': persons,
+        'stage': name,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else float('inf'),
+        'peak_rss_bytes': memory.peak,
+        'rss_increase_bytes': memory.increase,
+    }
+
+def run_size(path, persons, formats, engine='sequential', workers=None):
+    '''Runs every stage on the return at path, returning one result per stage.'''
+    results = []
+
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        data_files = convert_stream(path, engine=engine, workers=workers)
+        seconds = time.perf_counter() - start
+    modules = [data_files.persons, data_files.requests, data_files.assessments,
+               data_files.named_plan, data_files.active_plans]
+    rows = sum(len(df) for df in modules)
+    results.append(_stage('parse', persons, rows, seconds, memory))
+
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        files = convert_for_sen2_tool(*modules)
+        seconds = time.perf_counter() - start
+    results.append(_stage('sen2_tool', persons, rows, seconds, memory))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for file_format in formats:
+            output = Path(output_dir) / f'{path.stem}.{file_format}'
+            with PeakMemory() as memory:
+                exported = export(files, output, file_format)
+            results.append(_stage(f'export_{file_format}', persons, rows,
+                                  exported['seconds'], memory))
+
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    '''
+    Returns a message for each stage in results that is slower, or used more
+    memory, than the same stage and size in baseline by more than tolerance.
+    Stages missing from the baseline are skipped.
+    '''
+    previous = {(result['persons'], result['stage']): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['persons'], result['stage']))
+        if before is None:
+            continue
+
+        name = f"{result['stage']} at {result['persons']:,} persons"
+        if (result['rows_per_second'] < before['rows_per_second'] * (1 - tolerance)
+                and result['seconds'] > before['seconds'] + TIME_SLACK):
+            regressions.append(
+                f"{name}: {result['rows_per_second']:,.0f} rows/s, "
+                f"baseline {before['rows_per_second']:,.0f}"
+            )
+        allowed = max(before['rss_increase_bytes'] * (1 + tolerance),
+                      before['rss_increase_bytes'] + MEMORY_SLACK)
+        if result['rss_increase_bytes'] > allowed:
+            regressions.append(
+                f"{name}: memory rose {result['rss_increase_bytes'] / 1024 ** 2:,.1f} MB, "
+                f"baseline {before['rss_increase_bytes'] / 1024 ** 2:,.1f} MB"
+            )
+    return regressions
+
+def print_results(results):
+    print(f"{'persons':>9} {'stage':<15} {'rows':>10} {'seconds':>9} {'rows/s':>11} "
+          f"{'peak MB':>9} {'rise MB':>9}")
+    for result in results:
+        print(f"{result['persons']:>9,} {result['stage']:<15} {result['rows']:>10,} "
+              f"{result['seconds']:>9.2f} {result['rows_per_second']:>11,.0f} "
+              f"{result['peak_rss_bytes'] / 1024 ** 2:>9,.1f} "
+              f"{result['rss_increase_bytes'] / 1024 ** 2:>9,.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the SEN2 converter on synthetic returns.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='numbers of persons to benchmark')
+    parser.add_argument('--formats', nargs='*', choices=list(EXPORTERS), default=FORMATS,
+                        help='export formats to benchmark')
+    parser.add_argument('--engine', choices=['sequential', 'parallel'], default='sequential')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes for the parallel engine')
+    parser.add_argument('--work-dir', type=Path, default=None,
+                        help='where to write the synthetic returns, reused if already there')
+    parser.add_argument('--save-baseline', type=Path, help='write the results to this JSON file')
+    parser.add_argument('--baseline', type=Path, help='compare the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown or memory growth against the baseline, '
+                             'as a fraction (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or Path(temp_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        results = []
+        for persons in args.sizes:
+            path = work_dir / f'sen2_synthetic_{persons}.xml'
+            if not path.exists():
+                write_return(path, persons)
+
+            # A fresh process per size, so one size's memory doesn't count against the next
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results.extend(executor.submit(
+                    run_size, path, persons, args.formats, args.engine, args.workers
+                ).result())
+
+    print_results(results)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'No regressions against {args.baseline}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
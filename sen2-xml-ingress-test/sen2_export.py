@@ -0,0 +1,184 @@
+'''
+Writes the SEN2 tool modules (m1-m5) to disk a batch of rows at a time.
+
+Each exporter takes the modules from convert_for_sen2_tool and a path, and
+never holds more than batch_size rows of a module in its own structures:
+
+    xlsx     one workbook, one sheet per module, via xlsxwriter's
+             constant_memory mode
+    zip      one zip file holding m1.csv to m5.csv
+    csv      a folder holding m1.csv to m5.csv
+    parquet  a folder holding m1.parquet to m5.parquet, one row group per batch
+'''
+
+import datetime
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from io import TextIOWrapper
+from pathlib import Path
+
+import pandas as pd
+
+
+BATCH_SIZE = 10_000
+
+
+def batches(df, batch_size):
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+def export_xlsx(files, path, batch_size=BATCH_SIZE):
+    import xlsxwriter
+
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    format1 = workbook.add_format({"num_format": "0.00"})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+
+    for mod_no, df in enumerate(files, start=1):
+        worksheet = workbook.add_worksheet(f'm{mod_no}')
+        if mod_no == len(files):
+            worksheet.set_column("A:A", None, format1)
+
+        worksheet.write_row(0, 0, df.columns)
+        row_no = 1
+        for batch in batches(df, batch_size):
+            # Missing values become None and are left as empty cells, as to_excel did
+            batch = batch.astype(object).where(batch.notna(), None)
+            for row in batch.itertuples(index=False, name=None):
+                for col_no, value in enumerate(row):
+                    # Nearly every cell is text, so skip write()'s type dispatch for it
+                    if type(value) is str:
+                        worksheet.write_string(row_no, col_no, value)
+                    elif isinstance(value, datetime.datetime):
+                        worksheet.write_datetime(row_no, col_no, value, date_format)
+                    elif value is not None:
+                        worksheet.write(row_no, col_no, value)
+                row_no += 1
+
+    workbook.close()
+
+def _write_csv(df, text, batch_size):
+    df.head(0).to_csv(text, index=False)
+    for batch in batches(df, batch_size):
+        batch.to_csv(text, index=False, header=False)
+
+def export_csv_zip(files, path, batch_size=BATCH_SIZE):
+    with zipfile.ZipFile(path, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for mod_no, df in enumerate(files, start=1):
+            # Opening the entry for writing compresses it as it is written
+            with archive.open(f'm{mod_no}.csv', mode='w') as entry:
+                with TextIOWrapper(entry, encoding='utf-8', newline='') as text:
+                    _write_csv(df, text, batch_size)
+
+def export_csv(files, directory, batch_size=BATCH_SIZE):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for mod_no, df in enumerate(files, start=1):
+        with open(directory / f'm{mod_no}.csv', 'w', encoding='utf-8', newline='') as text:
+            _write_csv(df, text, batch_size)
+
+def _parquet_schema(df):
+    import pyarrow as pa
+
+    # Columns that are entirely missing come out as pyarrow's null type,
+    # which the later batches of text in the same column wouldn't match.
+    # The same goes for the values of a coded column with no codes yet.
+    schema = pa.Schema.from_pandas(df.head(0), preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+        elif pa.types.is_dictionary(field.type) and pa.types.is_null(field.type.value_type):
+            schema = schema.set(
+                i, field.with_type(pa.dictionary(field.type.index_type, pa.string()))
+            )
+    return schema
+
+def export_parquet(files, directory, batch_size=BATCH_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for mod_no, df in enumerate(files, start=1):
+        schema = _parquet_schema(df)
+        with pq.ParquetWriter(directory / f'm{mod_no}.parquet', schema) as writer:
+            for batch in batches(df, batch_size):
+                writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+            if len(df) == 0:
+                writer.write_table(schema.empty_table())
+
+EXPORTERS = {
+    'xlsx': export_xlsx,
+    'zip': export_csv_zip,
+    'csv': export_csv,
+    'parquet': export_parquet,
+}
+
+class PeakMemory():
+    '''
+    Samples the process's resident memory on a background thread and keeps
+    the highest value seen, so it counts memory allocated inside xlsxwriter,
+    zlib and pyarrow as well as through Python.
+    '''
+
+    def __init__(self, interval=0.01):
+        import psutil
+
+        self.process = psutil.Process()
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.start = self.peak = self.process.memory_info().rss
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    @property
+    def increase(self):
+        return self.peak - self.start
+
+def export(files, path, file_format, batch_size=BATCH_SIZE):
+    '''
+    Writes the modules in file_format and returns how long it took and how
+    far the process's peak resident memory rose above where it started, i.e.
+    the memory the export needed on top of the modules themselves.
+    '''
+    exporter = EXPORTERS[file_format]
+
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        exporter(files, path, batch_size)
+        seconds = time.perf_counter() - start
+
+    return {'format': file_format, 'seconds': seconds, 'peak_bytes': memory.increase}
+
+def _export_bytes(exporter, files, suffix):
+    # The exporters write to disk, the Streamlit download button wants bytes
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    os.close(handle)
+    try:
+        exporter(files, path)
+        with open(path, 'rb') as exported:
+            return exported.read()
+    finally:
+        os.remove(path)
+
+def to_excel(files):
+    return _export_bytes(export_xlsx, files, '.xlsx')
+
+def to_zip(files):
+    return _export_bytes(export_csv_zip, files, '.zip')
@@ -0,0 +1,258 @@
+'''
+Incremental conversion for returns that are re-run many times with few changes.
+
+A PersonIndex, a SQLite file kept from one run of a return to the next,
+holds a fingerprint of the raw XML of every person converted last time and
+the rows the person produced in each module. On the next run each <Person>
+is cut out of the raw bytes and fingerprinted; persons whose fingerprint is
+unchanged get their rows from the index without being parsed, only new or
+changed persons are parsed and extracted.
+
+Persons are matched between runs by UPN, then UniqueLearnerNumber, then
+forename, surname and date of birth. The tables come out exactly as
+convert_stream would make them, and the run also returns a table of the
+persons that were added, changed or removed since the last run.
+
+    data_files, changes = convert_incremental('return.xml', 'return_index.sqlite')
+'''
+
+import hashlib
+import json
+import re
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import xml.etree.ElementTree as ET
+
+from sen2_xml import (
+    EXTRACTION_VERSION,
+    MODULE_COLUMNS,
+    MODULE_SCHEMA,
+    PERSON_START,
+    ExtractionReport,
+    XMLtoCSV,
+    _declaration,
+    _find_header,
+    _read_bytes,
+)
+
+
+# Stored rows are only reused by the same version of the index and of the
+# extraction, with the same module columns and types. Bump the first number
+# when the way rows are stored changes, and sen2_xml.EXTRACTION_VERSION when
+# the rows themselves would.
+INDEX_VERSION = hashlib.sha256(json.dumps(
+    [2, EXTRACTION_VERSION, MODULE_COLUMNS, MODULE_SCHEMA], sort_keys=True
+).encode('utf-8')).hexdigest()
+
+# pd.NA in stored rows, kept apart from None, which empty elements give
+STORED_NA = {'__NA__': True}
+
+KEY_FIELDS = [
+    re.compile(rb'<UPN>\s*([^<]+?)\s*</UPN>'),
+    re.compile(rb'<UniqueLearnerNumber>\s*([^<]+?)\s*</UniqueLearnerNumber>'),
+]
+NAME_FIELDS = [
+    re.compile(rb'<Forename>\s*([^<]*?)\s*</Forename>'),
+    re.compile(rb'<Surname>\s*([^<]*?)\s*</Surname>'),
+    re.compile(rb'<PersonBirthDate>\s*([^<]*?)\s*</PersonBirthDate>'),
+]
+
+CHANGES_COLUMNS = ['key', 'change', 'child_id']
+
+
+def person_slices(data):
+    '''Yields the raw bytes of each <Person> element in data, in order.'''
+    start = None
+    for person in PERSON_START.finditer(data):
+        if start is not None:
+            yield data[start:person.start()]
+        start = person.start()
+    if start is not None:
+        yield data[start:data.rfind(b'</Persons')]
+
+def person_key(person):
+    '''
+    Identifies a person across returns by UPN, UniqueLearnerNumber or, when
+    they have neither, by forename, surname and date of birth.
+    '''
+    for prefix, pattern in zip(('UPN', 'ULN'), KEY_FIELDS):
+        found = pattern.search(person)
+        if found:
+            return f"{prefix}:{found.group(1).decode('utf-8', 'replace')}"
+
+    values = []
+    for pattern in NAME_FIELDS:
+        found = pattern.search(person)
+        values.append(found.group(1).decode('utf-8', 'replace') if found else '')
+    return 'Name:' + '|'.join(values)
+
+def fingerprint(person):
+    return hashlib.blake2b(person, digest_size=16).digest()
+
+def _store_na(value):
+    if value is pd.NA:
+        return STORED_NA
+    raise TypeError(f'{type(value).__name__} values can\'t be stored in the index')
+
+def _load_na(value):
+    return pd.NA if value == STORED_NA else value
+
+def dump_rows(rows, missing, malformed):
+    '''
+    A person's rows and report as JSON, rather than a pickle, so reading an
+    index file back can't run code.
+    '''
+    missing = [[record, field, count] for (record, field), count in missing.items()]
+    return json.dumps([rows, missing, malformed], default=_store_na)
+
+def load_rows(stored):
+    '''The rows, missing and malformed fields dump_rows stored.'''
+    rows, missing, malformed = json.loads(stored, object_hook=_load_na)
+    return rows, {(record, field): count for record, field, count in missing}, malformed
+
+
+class PersonIndex():
+    '''
+    The fingerprints and rows of the persons in the last run of a return,
+    in a SQLite file.
+    '''
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS persons (key TEXT PRIMARY KEY, fingerprint BLOB, rows TEXT)'
+        )
+
+        version = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'version'"
+        ).fetchone()
+        if version is None or version[0] != INDEX_VERSION:
+            # Rows from another version of the extraction can't be trusted
+            self.connection.execute('DELETE FROM persons')
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (INDEX_VERSION,)
+            )
+            self.connection.commit()
+
+    def fingerprints(self):
+        return dict(self.connection.execute('SELECT key, fingerprint FROM persons'))
+
+    def rows(self, key):
+        stored, = self.connection.execute(
+            'SELECT rows FROM persons WHERE key = ?', (key,)
+        ).fetchone()
+        return load_rows(stored)
+
+    def update(self, changed, removed):
+        '''
+        Stores changed, a list of (key, fingerprint, rows), and deletes the
+        removed keys, in one transaction.
+        '''
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO persons VALUES (?, ?, ?)',
+                [(key, print_, dump_rows(*rows)) for key, print_, rows in changed],
+            )
+            self.connection.executemany(
+                'DELETE FROM persons WHERE key = ?', [(key,) for key in removed]
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+def _take_person_rows(datafiles, starts):
+    # The rows create_child has just appended to each module's buffer
+    return {
+        module: {column: values[starts[module]:] for column, values in buffer.data.items()}
+        for module, buffer in datafiles.buffers.items()
+    }
+
+def _restamp(rows, report, child_id):
+    # A person keeps their rows between runs but not their place in the return
+    for data in rows.values():
+        if 'child_id' in data:
+            data['child_id'] = [child_id] * len(data['child_id'])
+    for entry in report.malformed:
+        entry['child_id'] = child_id
+
+def convert_incremental(source, index_path):
+    '''
+    Converts the return at source, a path or binary file object, reusing the
+    rows of every person unchanged since the return was last converted with
+    the index at index_path. The index is then brought up to date with this
+    return, so it should only be shared by successive versions of one
+    return.
+
+    Returns the XMLtoCSV, with the same tables convert_stream would give,
+    and a DataFrame of the keys of the persons added, changed or removed
+    since the last run, with their child_id in this return.
+    '''
+    with _read_bytes(source) as data:
+        declaration = _declaration(data)
+
+        datafiles = XMLtoCSV()
+        datafiles.Header = datafiles.create_header(_find_header(data))
+        index = PersonIndex(index_path)
+
+        try:
+            previous = index.fingerprints()
+            seen = Counter()
+            current = set()
+            changed = []
+            changes = []
+
+            for person in person_slices(data):
+                key = person_key(person)
+                seen[key] += 1
+                # A key used by more than one person in the return is told apart
+                # by the order the persons come in
+                if seen[key] > 1:
+                    key = f'{key}#{seen[key]}'
+                current.add(key)
+                print_ = fingerprint(person)
+
+                if previous.get(key) == print_:
+                    datafiles.child_id += 1
+                    rows, missing, malformed = index.rows(key)
+                    report = ExtractionReport()
+                    report.missing.update(missing)
+                    report.malformed.extend(malformed)
+                    _restamp(rows, report, datafiles.child_id)
+                    for module, buffer in datafiles.buffers.items():
+                        buffer.extend(rows[module])
+                    datafiles.report.merge(report)
+                    continue
+
+                starts = {module: len(buffer) for module, buffer in datafiles.buffers.items()}
+                # Each person gets their own report so it can be stored with their rows
+                report = datafiles.report
+                datafiles.report = ExtractionReport()
+                datafiles.create_child(ET.fromstring(declaration + person))
+                person_report, datafiles.report = datafiles.report, report
+                datafiles.report.merge(person_report)
+
+                rows = _take_person_rows(datafiles, starts)
+                changed.append(
+                    (key, print_, (rows, dict(person_report.missing), person_report.malformed))
+                )
+                changes.append((key, 'changed' if key in previous else 'added', datafiles.child_id))
+
+            removed = [key for key in previous if key not in current]
+            changes.extend((key, 'removed', pd.NA) for key in removed)
+
+            index.update(changed, removed)
+        finally:
+            index.close()
+
+    datafiles.finish()
+    changes = pd.DataFrame(changes, columns=CHANGES_COLUMNS).astype(
+        {'change': 'category', 'child_id': 'Int32'}
+    )
+    return datafiles, changes
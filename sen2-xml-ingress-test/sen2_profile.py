@@ -0,0 +1,159 @@
+'''
+Timing and memory figures for one run of the SEN2 conversion.
+
+A Profiler collects two tables:
+
+    stages   one row per pipeline stage timed with profiler.stage(), e.g.
+             parse, convert_for_sen2_tool, to_excel: wall time, rows, how
+             far resident memory rose and its peak
+    records  one row per XMLtoCSV method wrapped by profiler.instrument():
+             calls, wall time with and without the methods it calls, and
+             the rows and memory of the module it fills, plus the time
+             left over for ElementTree's own parsing. With the parallel
+             engine the persons are handled in the workers, so only the
+             header, merge and finish methods are timed
+
+Nothing is wrapped or sampled unless a Profiler is passed in, so an
+unprofiled run costs one `if` per stage:
+
+    profiler = Profiler()  # or None to switch profiling off
+    data_files = convert_stream(path, profiler=profiler)
+    with profiled(profiler, 'convert_for_sen2_tool'):
+        files = convert_for_sen2_tool(...)
+    print(profiler.to_json())
+'''
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from sen2_export import PeakMemory
+
+
+# The XMLtoCSV methods timed per record type, and the module each one fills
+RECORD_METHODS = {
+    'create_header': ('Header', None),
+    'create_child': ('Person', None),
+    'create_person': ('Person', 'persons'),
+    'create_requests': ('Requests', 'requests'),
+    'create_assessments': ('Assessment', 'assessments'),
+    'create_named_plan': ('NamedPlan', 'named_plan'),
+    'create_active_plans': ('ActivePlans', 'active_plans'),
+    'merge_shard': ('Shard', None),
+    'finish': ('Modules', None),
+}
+# The methods XMLtoCSV's constructors call directly, so any time outside
+# them went on reading and parsing the XML
+TOP_LEVEL_METHODS = ['create_header', 'create_child', 'merge_shard', 'finish']
+
+STAGES_COLUMNS = ['stage', 'seconds', 'rows', 'rss_increase_bytes', 'peak_rss_bytes']
+RECORDS_COLUMNS = ['record', 'method', 'calls', 'seconds', 'self_seconds', 'rows', 'bytes']
+
+
+class Profiler():
+    def __init__(self):
+        self.stages = []
+        self.records = {}
+        # Time spent in the methods called by the one running, one per level
+        self.calls_below = []
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Times the block and records its memory. Set 'rows' on the dict this
+        yields to record how many rows the stage produced.
+        '''
+        entry = {'stage': name, 'rows': None}
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            yield entry
+            entry['seconds'] = time.perf_counter() - start
+        entry['rss_increase_bytes'] = memory.increase
+        entry['peak_rss_bytes'] = memory.peak
+        self.stages.append(entry)
+
+    def instrument(self, datafiles):
+        '''
+        Replaces the record methods of one XMLtoCSV instance with timed
+        versions. The class itself is left alone, so other conversions
+        running at the same time aren't slowed down.
+        '''
+        for method_name, (record, module) in RECORD_METHODS.items():
+            entry = {'record': record, 'method': method_name, 'calls': 0,
+                     'seconds': 0.0, 'self_seconds': 0.0, 'module': module}
+            self.records[method_name] = entry
+            method = getattr(datafiles, method_name)
+            setattr(datafiles, method_name, self._timed(method, entry))
+
+    def _timed(self, method, entry):
+        calls_below = self.calls_below
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            calls_below.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                below = calls_below.pop()
+                if calls_below:
+                    calls_below[-1] += seconds
+                entry['calls'] += 1
+                entry['seconds'] += seconds
+                entry['self_seconds'] += seconds - below
+
+        return timed
+
+    def add_modules(self, datafiles, parse_seconds=None):
+        '''
+        Adds the rows and memory of each module to the record it came from,
+        and, given the time the whole parse took, the time spent in the XML
+        parser itself, i.e. outside the record methods.
+        '''
+        for entry in self.records.values():
+            module = entry['module']
+            if module is not None:
+                df = getattr(datafiles, module)
+                entry['rows'] = len(df)
+                entry['bytes'] = int(df.memory_usage(deep=True).sum())
+
+        if parse_seconds is not None and self.records:
+            in_methods = sum(self.records[name]['seconds'] for name in TOP_LEVEL_METHODS)
+            self.records['xml'] = {
+                'record': 'XML', 'method': 'reading and parsing', 'calls': None,
+                'seconds': parse_seconds - in_methods,
+                'self_seconds': parse_seconds - in_methods, 'module': None,
+            }
+
+    def stages_frame(self):
+        return pd.DataFrame(self.stages, columns=STAGES_COLUMNS).astype({'rows': 'Int64'})
+
+    def records_frame(self):
+        return pd.DataFrame(list(self.records.values()), columns=RECORDS_COLUMNS).astype(
+            {'calls': 'Int64', 'rows': 'Int64', 'bytes': 'Int64'}
+        )
+
+    def to_dict(self):
+        return {
+            'stages': self.stages_frame().astype(object).where(lambda df: df.notna(), None)
+                                        .to_dict('records'),
+            'records': self.records_frame().astype(object).where(lambda df: df.notna(), None)
+                                          .to_dict('records'),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+@contextmanager
+def profiled(profiler, name):
+    '''profiler.stage(name), or nothing at all when profiler is None.'''
+    if profiler is None:
+        yield {}
+    else:
+        with profiler.stage(name) as stage:
+            yield stage
@@ -0,0 +1,215 @@
+'''
+Writes synthetic SEN2 returns for testing and benchmarking the converter.
+
+The returns have the structure XMLtoCSV reads, with every module populated:
+
+    Message
+        Header / CollectionDetails, Source
+        Persons / Person
+            Requests
+                Assessment / NamedPlan / PlanDetail
+                ActivePlans / PlacementDetail, SENneed
+
+Output is deterministic: the same counts and seed always give the same bytes,
+and every person has the same number of requests, assessments and so on, so
+the number of rows in each module is known in advance (see expected_rows).
+Values are drawn from the SEN2 code lists and a few optional fields are left
+out at random, as they are in real returns.
+
+    python sen2_synthetic.py <output xml> --persons 100000
+'''
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+
+SEXES = ['M', 'F']
+ETHNICITIES = [
+    'WBRI', 'WIRI', 'WIRT', 'WOTH', 'WROM', 'MWBC', 'MWBA', 'MWAS', 'MOTH', 'AIND',
+    'APKN', 'ABAN', 'AOTH', 'BCRB', 'BAFR', 'BOTH', 'CHNE', 'OOTH', 'REFU', 'NOBT',
+]
+REQUEST_OUTCOMES = ['A', 'B', 'C', 'D', 'E', 'F']
+ASSESSMENT_OUTCOMES = ['Y', 'N', 'A', 'W', 'H']
+SEN_SETTINGS = ['OLA', 'EYP', 'EO', 'NEET', 'NEETF', 'NEETP', 'OTH', 'PR']
+CEASE_REASONS = ['1', '2', '3', '4', '5', '6', '7', '8']
+SEN_TYPES = [
+    'ASD', 'HI', 'MLD', 'MSI', 'NSA', 'OTH', 'PD', 'PMLD', 'SEMH', 'SLCN', 'SLD', 'SPLD', 'VI',
+]
+REVIEW_OUTCOMES = ['Y', 'N']
+FLAGS = ['0', '1']
+
+
+def expected_rows(persons, requests_per_person=2, assessments_per_request=1,
+                  plan_details_per_plan=2, placements_per_plan=1):
+    '''The number of rows XMLtoCSV makes of each module from such a return.'''
+    requests = persons * requests_per_person
+    assessments = requests * assessments_per_request
+    return {
+        'persons': persons,
+        'requests': requests,
+        'assessments': assessments,
+        'named_plan': assessments * plan_details_per_plan,
+        'active_plans': requests * placements_per_plan,
+    }
+
+def _date(rng, first_year, last_year):
+    return f'{rng.randint(first_year, last_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+
+def _fields(values):
+    return ''.join(f'<{tag}>{value}</{tag}>' for tag, value in values if value is not None)
+
+def _header(la):
+    return (
+        '<Header>'
+        '<CollectionDetails>'
+        + _fields([('Collection', 'SEN2'), ('Year', '2023'), ('ReferenceDate', '2023-01-19')])
+        + '</CollectionDetails>'
+        '<Source>'
+        + _fields([
+            ('SourceLevel', 'L'),
+            ('LEA', la),
+            ('SoftwareCode', 'Synthetic'),
+            ('Release', '1'),
+            ('SerialNo', '1'),
+            ('DateTime', '2023-01-19T09:00:00'),
+        ])
+        + '</Source>'
+        '</Header>'
+    )
+
+def _plan_detail(rng, rank):
+    return '<PlanDetail>' + _fields([
+        ('URN', str(rng.randint(100000, 149999))),
+        ('UKPRN', str(rng.randint(10000000, 10099999)) if rng.random() < 0.3 else None),
+        ('SENSetting', rng.choice(SEN_SETTINGS)),
+        ('PlacementRank', str(rank)),
+        ('SENunitIndicator', rng.choice(FLAGS)),
+        ('ResourcedProvisionIndicator', rng.choice(FLAGS)),
+    ]) + '</PlanDetail>'
+
+def _assessment(rng, plan_details):
+    ceased = rng.random() < 0.1
+    named_plan = '<NamedPlan>' + _fields([
+        ('StartDate', _date(rng, 2015, 2022)),
+        ('PlanRes', rng.choice(FLAGS)),
+        ('PlanWPB', rng.choice(FLAGS)),
+        ('PB', rng.choice(FLAGS)),
+        ('OA', rng.choice(FLAGS)),
+        ('DP', rng.choice(FLAGS)),
+        ('CeaseDate', _date(rng, 2022, 2022) if ceased else None),
+        ('CeaseReason', rng.choice(CEASE_REASONS) if ceased else None),
+    ]) + ''.join(_plan_detail(rng, rank) for rank in range(1, plan_details + 1)) + '</NamedPlan>'
+
+    return '<Assessment>' + _fields([
+        ('AssessmentOutcome', rng.choice(ASSESSMENT_OUTCOMES)),
+        ('AssessmentOutcomeDate', _date(rng, 2014, 2022)),
+        ('AssessmentMediation', rng.choice(FLAGS)),
+        ('AssessmentTribunal', rng.choice(FLAGS)),
+        ('OtherMediation', rng.choice(FLAGS)),
+        ('OtherTribunal', rng.choice(FLAGS)),
+        ('Week20', rng.choice(FLAGS)),
+    ]) + named_plan + '</Assessment>'
+
+def _active_plans(rng, la, placements):
+    placement_details = ''.join(
+        '<PlacementDetail>' + _fields([
+            ('URN', str(rng.randint(100000, 149999))),
+            ('SENSetting', rng.choice(SEN_SETTINGS)),
+            ('PlacementRank', str(rank)),
+            ('EntryDate', _date(rng, 2015, 2022)),
+            ('LeavingDate', _date(rng, 2022, 2023) if rng.random() < 0.1 else None),
+            ('SENunitIndicator', rng.choice(FLAGS)),
+            ('ResourcedProvisionIndicator', rng.choice(FLAGS)),
+        ]) + '</PlacementDetail>'
+        for rank in range(1, placements + 1)
+    )
+    sen_need = '<SENneed>' + _fields([
+        ('SENtype', rng.choice(SEN_TYPES)),
+        ('SENtypeRank', '1'),
+    ]) + '</SENneed>'
+
+    return '<ActivePlans>' + _fields([
+        ('TransferLA', la if rng.random() < 0.05 else None),
+        ('RES', rng.choice(FLAGS)),
+        ('WPB', rng.choice(FLAGS)),
+        ('ReviewMeeting', _date(rng, 2022, 2022)),
+        ('ReviewOutcome', rng.choice(REVIEW_OUTCOMES)),
+        ('LastReview', _date(rng, 2021, 2022)),
+    ]) + placement_details + sen_need + '</ActivePlans>'
+
+def _person(rng, n, la, requests_per_person, assessments_per_request,
+            plan_details_per_plan, placements_per_plan):
+    has_upn = rng.random() < 0.9
+    person = _fields([
+        ('Surname', f'Surname{n}'),
+        ('Forename', f'Forename{n}'),
+        ('PersonBirthDate', _date(rng, 2000, 2022)),
+        ('Sex', rng.choice(SEXES)),
+        ('Ethnicity', rng.choice(ETHNICITIES)),
+        ('PostCode', f'AB{rng.randint(1, 99)} {rng.randint(1, 9)}CD' if rng.random() < 0.8 else None),
+        ('UPN', f'A{n:012d}' if has_upn else None),
+        ('UniqueLearnerNumber', str(1000000000 + n) if rng.random() < 0.2 else None),
+        ('UPNunknown', None if has_upn else 'UN1'),
+    ])
+
+    requests = []
+    for _ in range(requests_per_person):
+        requests.append(
+            '<Requests>'
+            + _fields([
+                ('ReceivedDate', _date(rng, 2014, 2022)),
+                ('RYA', rng.choice(FLAGS)),
+                ('RequestOutcomeDate', _date(rng, 2014, 2022)),
+                ('RequestOutcome', rng.choice(REQUEST_OUTCOMES)),
+                ('RequestMediation', rng.choice(FLAGS)),
+                ('RequestTribunal', rng.choice(FLAGS)),
+                ('Exported', rng.choice(FLAGS)),
+            ])
+            + ''.join(_assessment(rng, plan_details_per_plan) for _ in range(assessments_per_request))
+            + (_active_plans(rng, la, placements_per_plan) if placements_per_plan else '')
+            + '</Requests>'
+        )
+
+    return f'<Person>{person}{"".join(requests)}</Person>\n'
+
+def write_return(output, persons, requests_per_person=2, assessments_per_request=1,
+                 plan_details_per_plan=2, placements_per_plan=1, la='999', seed=0):
+    '''
+    Writes a synthetic return to output, a path or a binary file object,
+    a person at a time so that returns bigger than memory can be made.
+    '''
+    if isinstance(output, (str, Path)):
+        with open(output, 'wb') as xml_file:
+            return write_return(xml_file, persons, requests_per_person, assessments_per_request,
+                                plan_details_per_plan, placements_per_plan, la, seed)
+
+    rng = random.Random(seed)
+    output.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<Message>{_header(la)}\n<Persons>\n'.encode('utf-8'))
+    for n in range(persons):
+        output.write(_person(rng, n, la, requests_per_person, assessments_per_request,
+                             plan_details_per_plan, placements_per_plan).encode('utf-8'))
+    output.write(b'</Persons>\n</Message>\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic SEN2 XML return.')
+    parser.add_argument('output', type=Path, help='XML file to write')
+    parser.add_argument('--persons', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2, help='requests per person')
+    parser.add_argument('--assessments', type=int, default=1, help='assessments per request')
+    parser.add_argument('--plan-details', type=int, default=2, help='PlanDetails per NamedPlan')
+    parser.add_argument('--placements', type=int, default=1,
+                        help='PlacementDetails per ActivePlans, 0 for no ActivePlans')
+    parser.add_argument('--la', default='999', help='LA code for the header')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_return(args.output, args.persons, args.requests, args.assessments,
+                 args.plan_details, args.placements, args.la, args.seed)
+    print(f'Wrote {args.persons} persons to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,765 @@
+import mmap
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as ET
+
+
+# Output columns for each module, in the order the tables have always had.
+# The identifying columns are added by XMLtoCSV rather than read from the XML.
+PERSONS_COLUMNS = [
+    'Surname',
+    'Forename',
+    'PersonBirthDate',
+    'Sex',
+    'Ethnicity',
+    'PostCode',
+    'UPN',
+    'UniqueLearnerNumber',
+    'UPNunknown',
+    'child_id',
+]
+
+REQUESTS_COLUMNS = [
+    "ReceivedDate",
+    "RYA",
+    "RequestOutcomeDate",
+    "RequestOutcome",
+    "RequestMediation",
+    "RequestTribunal",
+    "Exported",
+    'child_id',
+    'requests_id',
+]
+
+ASSESSMENTS_COLUMNS = [
+    "AssessmentOutcome",
+    "AssessmentOutcomeDate",
+    "AssessmentMediation",
+    "AssessmentTribunal",
+    "OtherMediation",
+    "OtherTribunal",
+    "Week20",
+    'name',
+    'child_id',
+    'requests_id',
+    'assessment_id',
+]
+
+NAMED_PLAN_COLUMNS = [
+    'StartDate',
+    'URN',
+    'UKPRN',
+    'SENSetting',
+    'PlacementRank',
+    'SENunitIndicator',
+    'ResourcedProvisionIndicator',
+    'PlanRes',
+    'PlanWPB',
+    'PB',
+    'OA',
+    'DP',
+    'CeaseDate',
+    'CeaseReason',
+    'SENSettingOther',
+    'name',
+    'child_id',
+    'requests_id',
+    'assessment_id',
+]
+
+ACTIVE_PLANS_COLUMNS = [
+    'TransferLA',
+    'URN',
+    'UKPRN',
+    'SENSetting',
+    'SENSettingOther',
+    'PlacementRank',
+    'EntryDate',
+    'LeavingDate',
+    'SENunitIndicator',
+    'ResourcedProvisionIndicator',
+    'RES',
+    'WPB',
+    'SENtype',
+    'SENtypeRank',
+    'ReviewMeeting',
+    'ReviewOutcome',
+    'LastReview',
+    'name',
+    'child_id',
+    'requests_id',
+]
+
+# Bump whenever a change to the extraction would change the rows a person
+# makes, so the rows sen2_incremental has stored from earlier runs aren't reused
+EXTRACTION_VERSION = 1
+
+MODULE_COLUMNS = {
+    'persons': PERSONS_COLUMNS,
+    'requests': REQUESTS_COLUMNS,
+    'assessments': ASSESSMENTS_COLUMNS,
+    'named_plan': NAMED_PLAN_COLUMNS,
+    'active_plans': ACTIVE_PLANS_COLUMNS,
+}
+
+# How each column is typed when its module is built. Columns not listed here,
+# such as names, postcodes and free text, stay as strings.
+#   date      datetime64, from the SEN2 ccyy-mm-dd format
+#   category  a code from one of the SEN2 code lists
+#   Int8      a small number that may be missing, e.g. a rank
+#   int16/32  an id assigned by XMLtoCSV, never missing
+ID_TYPES = {
+    'child_id': 'int32',
+    'requests_id': 'int16',
+    'assessment_id': 'int16',
+}
+
+MODULE_SCHEMA = {
+    'persons': {
+        'PersonBirthDate': 'date',
+        'Sex': 'category',
+        'Ethnicity': 'category',
+        'UPNunknown': 'category',
+        **ID_TYPES,
+    },
+    'requests': {
+        'ReceivedDate': 'date',
+        'RYA': 'category',
+        'RequestOutcomeDate': 'date',
+        'RequestOutcome': 'category',
+        'RequestMediation': 'category',
+        'RequestTribunal': 'category',
+        'Exported': 'category',
+        **ID_TYPES,
+    },
+    'assessments': {
+        'AssessmentOutcome': 'category',
+        'AssessmentOutcomeDate': 'date',
+        'AssessmentMediation': 'category',
+        'AssessmentTribunal': 'category',
+        'OtherMediation': 'category',
+        'OtherTribunal': 'category',
+        'Week20': 'category',
+        **ID_TYPES,
+    },
+    'named_plan': {
+        'StartDate': 'date',
+        'URN': 'category',
+        'UKPRN': 'category',
+        'SENSetting': 'category',
+        'PlacementRank': 'Int8',
+        'SENunitIndicator': 'category',
+        'ResourcedProvisionIndicator': 'category',
+        'PlanRes': 'category',
+        'PlanWPB': 'category',
+        'PB': 'category',
+        'OA': 'category',
+        'DP': 'category',
+        'CeaseDate': 'date',
+        'CeaseReason': 'category',
+        **ID_TYPES,
+    },
+    'active_plans': {
+        'TransferLA': 'category',
+        'URN': 'category',
+        'UKPRN': 'category',
+        'SENSetting': 'category',
+        'PlacementRank': 'Int8',
+        'EntryDate': 'date',
+        'LeavingDate': 'date',
+        'SENunitIndicator': 'category',
+        'ResourcedProvisionIndicator': 'category',
+        'RES': 'category',
+        'WPB': 'category',
+        'SENtype': 'category',
+        'SENtypeRank': 'Int8',
+        'ReviewMeeting': 'date',
+        'ReviewOutcome': 'category',
+        'LastReview': 'date',
+        'child_id': 'int32',
+        'requests_id': 'int16',
+    },
+}
+
+
+class ExtractionReport():
+    '''
+    Record of the fields the extraction plans could not read cleanly.
+
+    missing counts fields that were absent, by record type and field, since
+    most SEN2 fields are optional and absence is routine. malformed keeps one
+    entry per problem field, as those usually point to a bad return.
+    '''
+
+    def __init__(self):
+        self.missing = Counter()
+        self.malformed = []
+
+    def add_missing(self, record, fields):
+        for field in fields:
+            self.missing[(record, field)] += 1
+
+    def add_malformed(self, record, field, problem, child_id):
+        self.malformed.append(
+            {'record': record, 'field': field, 'problem': problem, 'child_id': child_id}
+        )
+
+    def missing_frame(self):
+        rows = [
+            {'record': record, 'field': field, 'count': count}
+            for (record, field), count in self.missing.items()
+        ]
+        return pd.DataFrame(rows, columns=['record', 'field', 'count'])
+
+    def malformed_frame(self):
+        return pd.DataFrame(self.malformed, columns=['record', 'field', 'problem', 'child_id'])
+
+    def merge(self, other):
+        self.missing.update(other.missing)
+        self.malformed.extend(other.malformed)
+
+
+class ExtractionPlan():
+    '''
+    The fields wanted from one record type, compiled once and reused for
+    every element of that type.
+
+    extract reads all the wanted fields in a single pass over the element's
+    children rather than one find() per field. A field that isn't there is
+    reported as missing, one that is repeated or has child elements of its
+    own is reported as malformed; both come back as pd.NA except a repeated
+    field, which keeps its first value as find() did.
+    '''
+
+    def __init__(self, record, fields):
+        self.record = record
+        self.fields = list(fields)
+        self.wanted = frozenset(self.fields)
+
+    def extract(self, element, report, child_id=None):
+        values = dict.fromkeys(self.fields, pd.NA)
+        if element is None:
+            report.add_missing(self.record, self.fields)
+            return values
+
+        found = set()
+        for field in element:
+            tag = field.tag
+            if tag not in self.wanted:
+                continue
+            if tag in found:
+                report.add_malformed(self.record, tag, 'repeated', child_id)
+                continue
+            found.add(tag)
+            if len(field):
+                report.add_malformed(self.record, tag, 'has child elements', child_id)
+                continue
+            values[tag] = field.text
+
+        if len(found) < len(self.fields):
+            report.add_missing(self.record, self.wanted.difference(found))
+        return values
+
+
+COLLECTION_PLAN = ExtractionPlan('CollectionDetails', ['Collection', 'Year', 'ReferenceDate'])
+SOURCE_PLAN = ExtractionPlan(
+    'Source',
+    [
+        "SourceLevel",
+        "LEA",
+        "SoftwareCode",
+        "Release",
+        "SerialNo",
+        "DateTime",
+    ]
+)
+PERSON_PLAN = ExtractionPlan('Person', PERSONS_COLUMNS[:-1])
+REQUESTS_PLAN = ExtractionPlan('Requests', REQUESTS_COLUMNS[:-2])
+ASSESSMENT_PLAN = ExtractionPlan('Assessment', ASSESSMENTS_COLUMNS[:-4])
+NAMED_PLAN_PLAN = ExtractionPlan(
+    'NamedPlan',
+    [
+        'StartDate',
+        'PlanRes',
+        'PlanWPB',
+        'PB',
+        'OA',
+        'DP',
+        'CeaseDate',
+        'CeaseReason'
+    ]
+)
+PLAN_DETAIL_PLAN = ExtractionPlan(
+    'PlanDetail',
+    [
+        'URN',
+        'UKPRN',
+        'SENSetting',
+        'SENSettingOther',
+        'PlacementRank',
+        'SENunitIndicator',
+        'ResourcedProvisionIndicator'
+    ]
+)
+ACTIVE_PLANS_PLAN = ExtractionPlan(
+    'ActivePlans',
+    [
+        'TransferLA',
+        'RES',
+        'WPB',
+        'ReviewMeeting',
+        'ReviewOutcome',
+        'LastReview'
+    ]
+)
+PLACEMENT_DETAIL_PLAN = ExtractionPlan(
+    'PlacementDetail',
+    [
+        'URN',
+        'SENSetting',
+        'SENSettingOther',
+        'PlacementRank',
+        'EntryDate',
+        'LeavingDate',
+        'SENunitIndicator',
+        'ResourcedProvisionIndicator',
+    ]
+)
+SEN_NEED_PLAN = ExtractionPlan('SENneed', ['SENtype', 'SENtypeRank'])
+
+
+class ModuleBuffer():
+    '''
+    Column-wise store for the rows of one output module.
+
+    Rows are appended value by value onto one list per column while the XML
+    is walked, and the DataFrame is only built once, in to_frame, so the cost
+    of building a module grows linearly with the number of rows. Each column
+    is typed from its list as it goes into the frame, following schema.
+    '''
+
+    def __init__(self, columns, schema=None):
+        self.columns = list(columns)
+        self.schema = schema or {}
+        self.data = {column: [] for column in self.columns}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, row: dict):
+        # Columns missing from the row are filled with pd.NA, as pd.concat did
+        for column, values in self.data.items():
+            values.append(row.get(column, pd.NA))
+        self.rows += 1
+
+    def extend(self, data: dict):
+        '''Appends the columns of another buffer with the same columns.'''
+        for column, values in self.data.items():
+            values.extend(data[column])
+        self.rows += len(data[self.columns[0]])
+
+    def to_frame(self, report=None, record=None):
+        '''
+        Builds the module's DataFrame. Values that don't fit their column's
+        type are left missing and, given a report, recorded as malformed.
+        '''
+        columns = {}
+        for column in self.columns:
+            values = self.data[column]
+            kind = self.schema.get(column)
+            if kind is None:
+                columns[column] = pd.Series(values, dtype=object)
+            elif kind == 'date':
+                columns[column] = pd.to_datetime(
+                    pd.Series(values, dtype=object), format='%Y-%m-%d', errors='coerce'
+                )
+            elif kind == 'category':
+                categories = pd.unique(pd.Series(values, dtype=object).dropna())
+                # Giving the categories as text keeps an all-missing column
+                # from getting float categories
+                columns[column] = pd.Series(pd.Categorical(
+                    values, categories=pd.Index(sorted(categories), dtype=object)
+                ))
+            elif kind == 'Int8':
+                columns[column] = pd.to_numeric(
+                    pd.Series(values, dtype=object), errors='coerce'
+                ).astype('Int8')
+            else:
+                columns[column] = pd.Series(np.asarray(values, dtype=kind))
+
+            if report is not None and kind in ('date', 'Int8'):
+                self.report_unreadable(columns[column], column, kind, report, record)
+
+        return pd.DataFrame(columns, columns=self.columns)
+
+    def report_unreadable(self, typed, column, kind, report, record):
+        given = pd.Series(self.data[column], dtype=object).notna()
+        child_ids = self.data.get('child_id')
+        for row in (given & typed.isna()).to_numpy().nonzero()[0]:
+            child_id = child_ids[row] if child_ids is not None else None
+            report.add_malformed(record, column, f'not a valid {kind}', child_id)
+
+
+class XMLtoCSV():
+    def __init__(self, root=None):
+        self.child_id = 0
+        self.Header = None
+        self.name = None
+        self.buffers = {
+            module: ModuleBuffer(columns, MODULE_SCHEMA[module])
+            for module, columns in MODULE_COLUMNS.items()
+        }
+        self.report = ExtractionReport()
+
+        # With no root the tables are filled in by from_stream instead
+        if root is None:
+            return
+
+        header = root.find('Header')
+        self.Header = self.create_header(header)
+
+        children  = root.find('Persons')
+
+        for child in children.findall('Person'):
+            self.create_child(child)
+
+        self.finish()
+
+    @classmethod
+    def from_stream(cls, source, profiler=None):
+        '''
+        Builds the same tables as XMLtoCSV(root) from a file path or binary
+        file object, without ever holding the whole tree in memory.
+
+        Each <Person> is handed to create_child as soon as its end tag has been
+        parsed, then cleared and detached from <Persons>, so peak memory
+        depends on the size of one person rather than the size of the file.
+        '''
+        datafiles = cls()
+        if profiler is not None:
+            profiler.instrument(datafiles)
+        persons = None
+
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == 'Persons':
+                    persons = element
+                continue
+
+            if element.tag == 'Header':
+                datafiles.Header = datafiles.create_header(element)
+                element.clear()
+            elif element.tag == 'Person' and persons is not None:
+                datafiles.create_child(element)
+                # clear() empties the person, remove() drops the empty shell
+                # so <Persons> doesn't grow by one element per child
+                element.clear()
+                persons.remove(element)
+
+        datafiles.finish()
+        return datafiles
+
+    @classmethod
+    def from_shards(cls, source, workers=None, persons_per_shard=5000, profiler=None):
+        '''
+        Builds the same tables as from_stream using a pool of worker processes.
+
+        The <Person> elements are cut out of the raw bytes in shards of
+        persons_per_shard, and each shard is parsed in a worker that starts its
+        child_id count where the shard starts. requests_id and assessment_id
+        only count within a person, so merging the shards back in order gives
+        exactly the numbering and row order of the sequential walk.
+        '''
+        datafiles = cls()
+        if profiler is not None:
+            profiler.instrument(datafiles)
+        with _read_bytes(source) as data:
+            datafiles.Header = datafiles.create_header(_find_header(data))
+
+            workers = workers or os.cpu_count()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Only a few shards per worker are in flight at once so the
+                # pool doesn't copy the whole file into its queue up front
+                pending = deque()
+                for shard in split_persons(data, persons_per_shard):
+                    pending.append(executor.submit(_convert_shard, shard))
+                    if len(pending) >= workers * 2:
+                        datafiles.merge_shard(*pending.popleft().result())
+                while pending:
+                    datafiles.merge_shard(*pending.popleft().result())
+
+        datafiles.finish()
+        return datafiles
+
+    def merge_shard(self, buffers, report, persons):
+        for module, data in buffers.items():
+            self.buffers[module].extend(data)
+        self.report.merge(report)
+        self.child_id += persons
+
+    def finish(self):
+        '''Turns the column buffers into one DataFrame per module.'''
+        self.persons = self.buffers['persons'].to_frame(self.report, 'persons')
+        self.requests = self.buffers['requests'].to_frame(self.report, 'requests')
+        self.assessments = self.buffers['assessments'].to_frame(self.report, 'assessments')
+        named_plan = self.buffers['named_plan'].to_frame(self.report, 'named_plan')
+        # Plans are kept when they give a StartDate at all, so one that isn't
+        # a valid date stays in the table, blank, rather than being dropped
+        given = pd.Series(self.buffers['named_plan'].data['StartDate'], dtype=object).notna()
+        self.named_plan = named_plan[given.to_numpy()].copy()
+        self.active_plans = self.buffers['active_plans'].to_frame(self.report, 'active_plans')
+
+
+
+    def create_header(self, header):
+        header_dict = COLLECTION_PLAN.extract(header.find('CollectionDetails'), self.report)
+        header_dict.update(SOURCE_PLAN.extract(header.find('Source'), self.report))
+
+        header_df = pd.DataFrame.from_dict([header_dict])
+        return header_df
+
+    def create_child(self, person):
+        self.create_person(person)
+        self.create_requests(person)
+
+
+    def create_person(self, child):
+        self.child_id += 1
+        person_dict = PERSON_PLAN.extract(child, self.report, self.child_id)
+        # A missing forename or surname is left out rather than shown as <NA>
+        parts = [part for part in (person_dict['Forename'], person_dict['Surname']) if not pd.isna(part)]
+        self.name = ' '.join(parts) if parts else pd.NA
+        person_dict['child_id'] = self.child_id
+
+        self.buffers['persons'].append(person_dict)
+
+    def create_requests(self, child):
+        self.requests_id = 0
+
+        requests = child.findall('Requests')
+        for request in requests:
+            self.requests_id += 1
+
+            requests_dict = REQUESTS_PLAN.extract(request, self.report, self.child_id)
+
+            requests_dict['child_id'] = self.child_id
+            requests_dict['requests_id'] = self.requests_id
+
+            self.buffers['requests'].append(requests_dict)
+
+            self.create_assessments(request)
+            self.create_active_plans(request)
+
+    def create_assessments(self, request):
+        self.assessment_id = 0
+
+        assessments = request.findall('Assessment')
+
+        for assessment in assessments:
+
+            # assessments
+            self.assessment_id += 1
+
+            assessment_dict = ASSESSMENT_PLAN.extract(assessment, self.report, self.child_id)
+
+            assessment_dict['name'] = self.name
+            assessment_dict['child_id'] = self.child_id
+            assessment_dict['requests_id'] = self.requests_id
+            assessment_dict['assessment_id'] = self.assessment_id
+
+            self.buffers['assessments'].append(assessment_dict)
+
+            # named_plans
+            self.create_named_plan(assessment)
+
+    def create_named_plan(self, assessment):
+        named_plan_locs = assessment.find('NamedPlan')
+
+        if named_plan_locs is not None and len(named_plan_locs):
+            # NamedPlan level fields are read once and shared by every PlanDetail
+            named_plan_dict = NAMED_PLAN_PLAN.extract(named_plan_locs, self.report, self.child_id)
+            named_plan_dict['name'] = self.name
+            named_plan_dict['child_id'] = self.child_id
+            named_plan_dict['requests_id'] = self.requests_id
+            named_plan_dict['assessment_id'] = self.assessment_id
+
+            for plan_detail in named_plan_locs.findall('PlanDetail'):
+                plan_detail_dict = PLAN_DETAIL_PLAN.extract(plan_detail, self.report, self.child_id)
+                plan_detail_dict.update(named_plan_dict)
+
+                self.buffers['named_plan'].append(plan_detail_dict)
+
+    def create_active_plans(self, request):
+        active_plan_locs = request.find('ActivePlans')
+
+        if active_plan_locs is not None and len(active_plan_locs):
+            # ActivePlans and SENneed fields are read once and shared by every PlacementDetail
+            active_plans_dict = ACTIVE_PLANS_PLAN.extract(active_plan_locs, self.report, self.child_id)
+            active_plans_dict.update(
+                SEN_NEED_PLAN.extract(active_plan_locs.find('SENneed'), self.report, self.child_id)
+            )
+            active_plans_dict['name'] = self.name
+            active_plans_dict['child_id'] = self.child_id
+            active_plans_dict['requests_id'] = self.requests_id
+
+            for placement_detail in active_plan_locs.findall('PlacementDetail'):
+                placement_detail_dict = PLACEMENT_DETAIL_PLAN.extract(
+                    placement_detail, self.report, self.child_id
+                )
+                placement_detail_dict.update(active_plans_dict)
+
+                self.buffers['active_plans'].append(placement_detail_dict)
+
+# The XML declaration, a whole <Header> element and the opening tag of a
+# <Person>. Header is never nested, so its first closing tag ends it.
+XML_DECLARATION = re.compile(rb'\s*<\?xml[^>]*\?>')
+HEADER_ELEMENT = re.compile(rb'<Header[\s>].*?</Header\s*>', re.DOTALL)
+PERSON_START = re.compile(rb'<Person[\s>]')
+
+@contextmanager
+def _read_bytes(source):
+    '''
+    The bytes of source. A path is memory-mapped rather than read, and the
+    map is closed again when the with block ends. An empty file, which
+    can't be mapped, is just b''.
+    '''
+    if not isinstance(source, (str, os.PathLike)):
+        yield source.read()
+        return
+    with open(source, 'rb') as xml_file:
+        if os.fstat(xml_file.fileno()).st_size == 0:
+            yield b''
+            return
+        data = mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield data
+    finally:
+        data.close()
+
+def _declaration(data):
+    declaration = XML_DECLARATION.match(data)
+    return declaration.group().strip() if declaration else b''
+
+def _find_header(data):
+    header = HEADER_ELEMENT.search(data)
+    if header is None:
+        raise ValueError('No <Header> element found, this does not look like a SEN2 return')
+    return ET.fromstring(_declaration(data) + header.group())
+
+def split_persons(data, persons_per_shard):
+    '''
+    Yields (first_child_id, shard) pairs, where shard is a standalone XML
+    document holding the next persons_per_shard <Person> elements of data.
+
+    Only the opening tags are searched for, and each shard is one slice of
+    the raw bytes from the first of its persons to the first of the next
+    shard's, so splitting costs far less than parsing.
+    '''
+    declaration = _declaration(data)
+    first_child_id = 1
+    shard_start = None
+    persons = 0
+    for person in PERSON_START.finditer(data):
+        if persons == persons_per_shard:
+            shard = data[shard_start:person.start()]
+            yield first_child_id, declaration + b'<Persons>' + shard + b'</Persons>'
+            first_child_id += persons
+            persons = 0
+        if persons == 0:
+            shard_start = person.start()
+        persons += 1
+
+    if persons:
+        shard = data[shard_start:data.rfind(b'</Persons')]
+        yield first_child_id, declaration + b'<Persons>' + shard + b'</Persons>'
+
+def _convert_shard(shard):
+    # Runs in a worker process, so it has to be a module level function
+    first_child_id, xml = shard
+    datafiles = XMLtoCSV()
+    datafiles.child_id = first_child_id - 1
+
+    persons = ET.fromstring(xml).findall('Person')
+    for child in persons:
+        datafiles.create_child(child)
+
+    buffers = {module: buffer.data for module, buffer in datafiles.buffers.items()}
+    return buffers, datafiles.report, len(persons)
+
+
+def convert_data(root: ET.Element):
+    datafiles = XMLtoCSV(root)
+
+    return datafiles
+
+def convert_stream(source, engine='sequential', workers=None, persons_per_shard=5000,
+                   profiler=None):
+    '''
+    Streaming version of convert_data for a file path or binary file object.
+
+    engine='sequential' walks the file one person at a time in this process,
+    engine='parallel' parses shards of persons_per_shard persons across
+    workers processes (all cores by default). Both give identical tables.
+
+    Given a sen2_profile.Profiler, the parse is recorded as its 'parse'
+    stage along with the time spent on each record type.
+    '''
+    if engine not in ('sequential', 'parallel'):
+        raise ValueError(f"engine must be 'sequential' or 'parallel', not {engine!r}")
+
+    if profiler is None:
+        return _convert_stream(source, engine, workers, persons_per_shard)
+
+    with profiler.stage('parse') as stage:
+        datafiles = _convert_stream(source, engine, workers, persons_per_shard, profiler)
+        stage['rows'] = sum(len(buffer) for buffer in datafiles.buffers.values())
+    profiler.add_modules(datafiles, stage['seconds'])
+    return datafiles
+
+def _convert_stream(source, engine, workers, persons_per_shard, profiler=None):
+    if engine == 'sequential':
+        return XMLtoCSV.from_stream(source, profiler)
+    return XMLtoCSV.from_shards(source, workers, persons_per_shard, profiler)
+
+def convert_for_sen2_tool(m1, m2, m3, m4, m5):
+
+    # Missing values are already missing in the typed columns from
+    # ModuleBuffer.to_frame, so there are no '' or '<NA>' strings to replace.
+    # Renaming in place only swaps the column labels, the data isn't copied.
+    m1.rename(columns={'child_id': 'Person ID',
+                        'PersonBirthDate': 'Dob (ccyy-mm-dd)',
+                        'Sex':'Gender'},
+                          inplace=True)
+    
+    m2.rename(columns={'requests_id':'Requests Record ID',
+                       'RequestOutcome':'Request Outcome',
+                       'RequestOutcomeDate':'Request Outcome Date',
+                       'ReceivedDate':'Date Request Was Received'},
+              inplace=True)
+    
+    m3.rename(columns={'requests_id':'Requests Record ID',
+                       'AssessmentOutcome':'Assessment Outcome To Issue EHCP',
+                       'AssessmentOutcomeDate':'Assessment Outcome Date'},
+              inplace=True)
+    
+    m4.rename(columns={'requests_id':'Requests Record ID',
+                       'StartDate':'EHC Plan Start Date',
+                       'CeaseDate':'Date EHC Plan Ceased',
+                       'CeaseReason':'Reason EHC Plan Ceased',},
+              inplace=True)
+    
+    
+    # m1 = convert_df(m1)
+    # m2 = convert_df(m2)
+    # m3 = convert_df(m3)
+    # m4 = convert_df(m4)
+    # m5 = convert_df(m5)
+    
+    return m1, m2, m3, m4, m5
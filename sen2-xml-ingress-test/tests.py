@@ -0,0 +1,270 @@
+import json
+import mmap
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from sen2_batch import convert_return, main
+from sen2_benchmark import compare
+from sen2_incremental import convert_incremental
+from sen2_profile import Profiler
+from sen2_synthetic import expected_rows, write_return
+from sen2_xml import convert_data, convert_stream
+# run these in the cmd line using python -m pytest <filepath>
+
+
+HEADER = '''<Header>
+<CollectionDetails><Collection>SEN2</Collection><Year>2023</Year><ReferenceDate>2023-01-19</ReferenceDate></CollectionDetails>
+<Source><SourceLevel>L</SourceLevel><LEA>999</LEA><SoftwareCode>Test</SoftwareCode><Release>1</Release><SerialNo>1</SerialNo><DateTime>2023-01-19T09:00:00</DateTime></Source>
+</Header>'''
+
+PERSON = '''<Person>
+<Surname>Surname{n}</Surname><Forename>Forename{n}</Forename><PersonBirthDate>2012-05-01</PersonBirthDate><Sex>F</Sex><Ethnicity>WBRI</Ethnicity><UPN>A{n:012d}</UPN>
+<Requests>
+<ReceivedDate>2022-03-01</ReceivedDate><RequestOutcomeDate>2022-04-01</RequestOutcomeDate><RequestOutcome>A</RequestOutcome>
+<Assessment>
+<AssessmentOutcome>Y</AssessmentOutcome><AssessmentOutcomeDate>2022-07-01</AssessmentOutcomeDate>
+<NamedPlan>
+<StartDate>2022-08-01</StartDate><PlanRes>1</PlanRes>
+<PlanDetail><URN>100001</URN><SENSetting>OLA</SENSetting><PlacementRank>1</PlacementRank></PlanDetail>
+<PlanDetail><URN>100002</URN><SENSetting>OLA</SENSetting><PlacementRank>2</PlacementRank></PlanDetail>
+</NamedPlan>
+</Assessment>
+<ActivePlans>
+<TransferLA>999</TransferLA>
+<PlacementDetail><URN>100001</URN><SENSetting>OLA</SENSetting><PlacementRank>1</PlacementRank><EntryDate>2022-09-01</EntryDate></PlacementDetail>
+<SENneed><SENtype>ASD</SENtype><SENtypeRank>1</SENtypeRank></SENneed>
+</ActivePlans>
+</Requests>
+<Requests>
+<ReceivedDate>2023-01-05</ReceivedDate>
+</Requests>
+</Person>
+'''
+
+
+def make_return(persons):
+    body = ''.join(PERSON.format(n=n) for n in range(persons))
+    return f'<Message>{HEADER}<Persons>{body}</Persons></Message>'.encode('utf-8')
+
+def test_stream_matches_tree():
+    xml = make_return(5)
+    from_tree = convert_data(ET.fromstring(xml))
+    from_stream = convert_stream(BytesIO(xml))
+
+    for module in ['persons', 'requests', 'assessments', 'named_plan', 'active_plans']:
+        pd.testing.assert_frame_equal(getattr(from_stream, module), getattr(from_tree, module))
+    pd.testing.assert_frame_equal(from_stream.Header, from_tree.Header)
+
+def test_ids_and_plan_details():
+    datafiles = convert_stream(BytesIO(make_return(2)))
+
+    assert datafiles.persons['child_id'].tolist() == [1, 2]
+    assert datafiles.requests['child_id'].tolist() == [1, 1, 2, 2]
+    assert datafiles.requests['requests_id'].tolist() == [1, 2, 1, 2]
+    assert datafiles.assessments['assessment_id'].tolist() == [1, 1]
+    assert datafiles.assessments['name'].tolist() == ['Forename0 Surname0', 'Forename1 Surname1']
+    # each PlanDetail keeps its own values alongside the shared NamedPlan ones
+    assert datafiles.named_plan['URN'].tolist() == ['100001', '100002', '100001', '100002']
+    assert datafiles.named_plan['StartDate'].tolist() == [pd.Timestamp('2022-08-01')] * 4
+    assert datafiles.active_plans['SENtype'].tolist() == ['ASD', 'ASD']
+
+def test_parallel_engine_matches_sequential():
+    xml = make_return(10)
+    sequential = convert_stream(BytesIO(xml))
+    parallel = convert_stream(BytesIO(xml), engine='parallel', workers=2, persons_per_shard=3)
+
+    for module in ['persons', 'requests', 'assessments', 'named_plan', 'active_plans']:
+        pd.testing.assert_frame_equal(getattr(parallel, module), getattr(sequential, module))
+    pd.testing.assert_frame_equal(parallel.Header, sequential.Header)
+    assert parallel.report.missing == sequential.report.missing
+
+def test_mapped_returns_are_closed(tmp_path, monkeypatch):
+    path = tmp_path / 'return.xml'
+    path.write_bytes(make_return(4))
+    maps = []
+    open_map = mmap.mmap
+    monkeypatch.setattr(mmap, 'mmap', lambda *args, **kwargs: maps.append(open_map(*args, **kwargs)) or maps[-1])
+
+    parallel = convert_stream(path, engine='parallel', workers=1, persons_per_shard=3)
+    incremental, _ = convert_incremental(path, tmp_path / 'index.sqlite')
+
+    assert len(maps) == 2 and all(mapped.closed for mapped in maps)
+    pd.testing.assert_frame_equal(incremental.persons, parallel.persons)
+
+    # An empty file can't be mapped, so it's read as no bytes at all
+    empty = tmp_path / 'empty.xml'
+    empty.touch()
+    with pytest.raises(ValueError, match='No <Header>'):
+        convert_stream(empty, engine='parallel', workers=1)
+
+def test_batch_keeps_dotted_names_apart(tmp_path):
+    for version in ['v1', 'v2']:
+        path = tmp_path / f'SEN2.2024.{version}.xml'
+        path.write_bytes(make_return(1))
+        convert_return(path, tmp_path / 'out', 'zip')
+        convert_return(path, tmp_path / 'out', 'csv')
+
+    assert sorted(path.name for path in (tmp_path / 'out').iterdir()) == [
+        'SEN2.2024.v1', 'SEN2.2024.v1.zip', 'SEN2.2024.v2', 'SEN2.2024.v2.zip']
+
+def test_batch_finds_upper_case_xml(tmp_path):
+    (tmp_path / 'returns').mkdir()
+    (tmp_path / 'returns' / 'lower.xml').write_bytes(make_return(1))
+    (tmp_path / 'returns' / 'UPPER.XML').write_bytes(make_return(1))
+    (tmp_path / 'returns' / 'notes.txt').write_text('not a return')
+
+    assert main([str(tmp_path / 'returns'), str(tmp_path / 'out'), '--format', 'zip', '--workers', '1']) == 0
+    assert sorted(path.name for path in (tmp_path / 'out').iterdir()) == ['UPPER.zip', 'lower.zip']
+
+@pytest.mark.parametrize('small, large', [(1_000, 20_000)])
+def test_scaling_is_linear(small, large):
+    def seconds_per_person(persons):
+        xml = make_return(persons)
+        start = time.perf_counter()
+        convert_stream(BytesIO(xml))
+        return (time.perf_counter() - start) / persons
+
+    seconds_per_person(small)  # warm up
+    small_rate = min(seconds_per_person(small) for _ in range(3))
+    large_rate = seconds_per_person(large)
+
+    # Quadratic growth would make each person about twenty times slower at
+    # the large size, linear growth keeps the cost per person about level
+    assert large_rate < small_rate * 3
+
+def test_missing_and_malformed_fields_are_reported():
+    xml = make_return(1).replace(
+        b'<Sex>F</Sex>', b'<Sex>F</Sex><Sex>M</Sex>'
+    ).replace(
+        b'<TransferLA>999</TransferLA>', b'<TransferLA><LA>999</LA></TransferLA>'
+    )
+    datafiles = convert_stream(BytesIO(xml))
+
+    assert datafiles.persons['Sex'].tolist() == ['F']
+    assert datafiles.active_plans['TransferLA'].isna().all()
+    assert datafiles.report.malformed == [
+        {'record': 'Person', 'field': 'Sex', 'problem': 'repeated', 'child_id': 1},
+        {'record': 'ActivePlans', 'field': 'TransferLA', 'problem': 'has child elements', 'child_id': 1},
+    ]
+    # the second request has no outcome and no assessments
+    assert datafiles.report.missing[('Requests', 'RequestOutcome')] == 1
+    assert datafiles.report.missing[('Person', 'UniqueLearnerNumber')] == 1
+
+def test_named_plan_with_a_bad_start_date_is_kept():
+    xml = make_return(3).replace(
+        b'<StartDate>2022-08-01</StartDate>', b'<StartDate>01/08/2022</StartDate>', 1
+    ).replace(b'<StartDate>2022-08-01</StartDate>', b'', 1)
+    datafiles = convert_stream(BytesIO(xml))
+
+    # the first person's plan stays, blank, and the second's, with no date, goes
+    assert datafiles.named_plan['child_id'].tolist() == [1, 1, 3, 3]
+    assert datafiles.named_plan['StartDate'].isna().tolist() == [True, True, False, False]
+    assert {'record': 'named_plan', 'field': 'StartDate', 'problem': 'not a valid date', 'child_id': 1} \
+        in datafiles.report.malformed
+
+def test_name_leaves_out_missing_parts():
+    xml = make_return(2).replace(b'<Forename>Forename0</Forename>', b'')
+    datafiles = convert_stream(BytesIO(xml))
+
+    assert datafiles.assessments['name'].tolist() == ['Surname0', 'Forename1 Surname1']
+
+def test_modules_follow_schema():
+    xml = make_return(2).replace(
+        b'<ReceivedDate>2023-01-05</ReceivedDate>', b'<ReceivedDate>05/01/2023</ReceivedDate>', 1
+    )
+    datafiles = convert_stream(BytesIO(xml))
+
+    assert datafiles.persons['PersonBirthDate'].dtype == 'datetime64[ns]'
+    assert datafiles.persons['Sex'].dtype == 'category'
+    assert datafiles.persons['child_id'].dtype == 'int32'
+    assert datafiles.named_plan['PlacementRank'].tolist() == [1, 2, 1, 2]
+    assert datafiles.active_plans['SENtype'].cat.categories.tolist() == ['ASD']
+    # dates that aren't ccyy-mm-dd are left blank and reported
+    assert datafiles.requests['ReceivedDate'].isna().tolist() == [False, True, False, False]
+    assert datafiles.report.malformed == [
+        {'record': 'requests', 'field': 'ReceivedDate', 'problem': 'not a valid date', 'child_id': 1},
+    ]
+
+def test_synthetic_returns_convert_to_expected_rows():
+    counts = {'requests_per_person': 3, 'assessments_per_request': 2,
+              'plan_details_per_plan': 1, 'placements_per_plan': 2}
+    xml, again = BytesIO(), BytesIO()
+    write_return(xml, 50, seed=1, **counts)
+    write_return(again, 50, seed=1, **counts)
+    assert xml.getvalue() == again.getvalue()
+
+    xml.seek(0)
+    datafiles = convert_stream(xml)
+    for module, rows in expected_rows(50, **counts).items():
+        assert len(getattr(datafiles, module)) == rows
+    assert datafiles.report.malformed == []
+
+def test_benchmark_flags_regressions():
+    baseline = [{'persons': 1000, 'stage': 'parse', 'seconds': 1.0,
+                 'rows_per_second': 10_000, 'rss_increase_bytes': 100 * 1024 ** 2}]
+    slower = [dict(baseline[0], seconds=2.0, rows_per_second=5_000)]
+    bigger = [dict(baseline[0], rss_increase_bytes=200 * 1024 ** 2)]
+
+    assert compare(baseline, baseline) == []
+    assert len(compare(slower, baseline)) == 1
+    assert len(compare(bigger, baseline)) == 1
+
+def test_incremental_reuses_unchanged_persons(tmp_path):
+    index = tmp_path / 'index.sqlite'
+    first, changes = convert_incremental(BytesIO(make_return(4)), index)
+    assert changes['change'].tolist() == ['added'] * 4
+
+    xml = make_return(4).replace(
+        b'<Surname>Surname1</Surname>', b'<Surname>Renamed</Surname>'
+    ).replace(b'<UPN>A000000000002</UPN>', b'<UPN>B000000000002</UPN>')
+    second, changes = convert_incremental(BytesIO(xml), index)
+
+    expected = convert_stream(BytesIO(xml))
+    for module in ['persons', 'requests', 'assessments', 'named_plan', 'active_plans']:
+        pd.testing.assert_frame_equal(getattr(second, module), getattr(expected, module))
+    assert changes['key'].tolist() == ['UPN:A000000000001', 'UPN:B000000000002', 'UPN:A000000000002']
+    assert changes['change'].tolist() == ['changed', 'added', 'removed']
+    assert changes['child_id'].tolist() == [2, 3, pd.NA]
+
+def test_incremental_index_stores_rows_as_json(tmp_path):
+    index = tmp_path / 'index.sqlite'
+    xml = make_return(2).replace(b'<Forename>Forename0</Forename>', b'<Forename/>')
+    convert_incremental(BytesIO(xml), index)
+    reused, changes = convert_incremental(BytesIO(xml), index)
+
+    assert changes.empty
+    expected = convert_stream(BytesIO(xml))
+    for module in ['persons', 'requests', 'assessments', 'named_plan', 'active_plans']:
+        pd.testing.assert_frame_equal(getattr(reused, module), getattr(expected, module))
+    assert reused.report.missing == expected.report.missing
+    # Empty elements stay None and absent fields pd.NA
+    assert reused.persons.loc[0, 'Forename'] is None
+    assert reused.persons.loc[0, 'UniqueLearnerNumber'] is pd.NA
+
+    with sqlite3.connect(index) as connection:
+        stored = [row for row, in connection.execute('SELECT rows FROM persons')]
+    assert all(isinstance(json.loads(row), list) for row in stored)
+
+def test_profiler_times_stages_and_records():
+    profiler = Profiler()
+    datafiles = convert_stream(BytesIO(make_return(3)), profiler=profiler)
+
+    stages = profiler.stages_frame()
+    assert stages['stage'].tolist() == ['parse']
+    assert stages['rows'].tolist() == [3 + 6 + 3 + 6 + 3]
+
+    records = profiler.records_frame().set_index('method')
+    assert records.loc['create_child', 'calls'] == 3
+    assert records.loc['create_requests', 'calls'] == 3
+    assert records.loc['create_named_plan', 'rows'] == len(datafiles.named_plan) == 6
+    # the time in each method is split between it and the methods it calls
+    assert records.loc['create_child', 'seconds'] == pytest.approx(
+        records.loc[['create_child', 'create_person', 'create_requests', 'create_assessments',
+                     'create_named_plan', 'create_active_plans'], 'self_seconds'].sum()
+    )
+    assert json.loads(profiler.to_json())['records'][0]['method'] == 'create_header'